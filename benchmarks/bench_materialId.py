@@ -0,0 +1,284 @@
+"""Scaling benchmark for the Material ID tool
+
+Runs the real materialId and materialIdCore modules against the recording
+fake Maya modules in benchmarks/fakemaya and an offscreen Qt platform. For
+every library size it reports wall time, peak Python memory and the number of
+calls to each Maya function per phase, and saves the results to JSON so two
+versions can be compared. Peak memory only covers allocations made by Python,
+not by Qt or NumPy internals that bypass the Python allocator.
+
+Without PySide2 only the UI-free phases run through materialIdCore.
+
+Example:
+    python benchmarks/bench_materialId.py --sizes 10 1000 50000 \\
+        --output bench.json --compare bench_before.json
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, 'fakemaya'),
+                os.path.join(os.path.dirname(HERE), 'scripts')]
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import fakerecorder
+import fakescene
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+
+class PhaseRecorder(object):
+    """Times phases and collects their Maya calls and peak memory"""
+    def __init__(self, size):
+        """Initializes recorder for one library size
+
+        Args:
+            size: The number of material IDs in the library
+        """
+        self.size = size
+        self.results = []
+        self.depth = 0
+
+    def run(self, phase, function, *args, **kwargs):
+        """Runs a function as one phase, nested phases count toward the outer one
+
+        Args:
+            phase: The name of the phase
+            function: The callable to measure
+
+        Returns:
+            The return value of the function
+        """
+        if self.depth:
+            return function(*args, **kwargs)
+
+        self.depth += 1
+        fakerecorder.take_calls()
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self.depth -= 1
+            self.results.append({
+                'size': self.size, 'phase': phase,
+                'seconds': round(seconds, 6),
+                'peak_kb': (tracemalloc.get_traced_memory()[1] 
+                            - start_memory) // 1024,
+                'calls': fakerecorder.take_calls()})
+
+    def wrap(self, owner, name, phase=None):
+        """Replaces a method with a version that runs as a phase
+
+        Args:
+            owner: The class or module that owns the method
+            name: The method name
+            phase: The phase name, defaults to the method name
+        """
+        function = getattr(owner, name)
+
+        @functools.wraps(function)
+        def phase_function(*args, **kwargs):
+            return self.run(phase or name, function, *args, **kwargs)
+        setattr(owner, name, phase_function)
+
+def write_library(folder, size):
+    """Writes a material ID file with generated names
+
+    Args:
+        folder: The folder to write the file to
+        size: The number of material IDs
+
+    Returns:
+        string: The path of the file
+    """
+    path = os.path.join(folder, f'materials_{size}.txt')
+    with open(path, 'w') as mat_file:
+        mat_file.write('\n'.join(f'Material{i}' for i in range(size)))
+    return path
+
+def bench_core(size, mat_path):
+    """Benchmarks the UI-free phases through materialIdCore
+
+    Args:
+        size: The number of material IDs
+        mat_path: The path of the material ID file
+
+    Returns:
+        list[dict]: The phase results
+    """
+    import materialIdCore as core
+
+    recorder = PhaseRecorder(size)
+
+    def create_material_list():
+        library = core.load_material_library(mat_path)
+        return library, core.MaterialStore(mat_path, library.names)
+
+    library, store = recorder.run('create_material_list', create_material_list)
+    recorder.run('create_shaders', core.build_shaders, library.colors)
+    recorder.run('reopen', create_material_list)
+
+    def add_new_mat():
+        added = store.add_many(['BenchAdded'])
+        colors = core.PaletteStore(mat_path).assign(added)
+        core.build_shaders(colors)
+
+    def delete_mat():
+        core.delete_shaders(store.delete_many(['BenchAdded']))
+
+    recorder.run('add_new_mat', add_new_mat)
+    recorder.run('delete_mat', delete_mat)
+    return recorder.results
+
+def bench_ui(size, mat_path, app):
+    """Benchmarks MaterialUI construction and edits with offscreen Qt
+
+    Args:
+        size: The number of material IDs
+        mat_path: The path of the material ID file
+        app: The running QApplication
+
+    Returns:
+        list[dict]: The phase results
+    """
+    from PySide2 import QtCore
+    import materialId
+
+    settings = QtCore.QSettings('KYBER', 'MaterialIDGenerator')
+    settings.setValue('matListPath', mat_path)
+    settings.setValue('numOfColumns', 2)
+
+    recorder = PhaseRecorder(size)
+    ui_class = materialId.MaterialUI
+    originals = {name: getattr(ui_class, name) for name in
+                 ('create_material_list', 'create_shaders', 'create_ui')}
+    for name in originals:
+        recorder.wrap(ui_class, name)
+    dialog_class = materialId.NoEmptyStringDialog
+    get_mat_name = dialog_class.get_mat_name
+
+    def show():
+        materialId.show()
+        app.processEvents()
+    try:
+        # Construction is split into the wrapped phases
+        materialId._window = None
+        ui = ui_class()
+        materialId._window = ui
+        recorder.run('show', show)
+
+        dialog_class.get_mat_name = lambda dialog: 'BenchAdded'
+        recorder.run('add_new_mat', ui.add_new_mat)
+        recorder.run('delete_mat', ui.delete_mat)
+        ui.close()
+        app.processEvents()
+
+        recorder.run('reopen', show)
+        ui.dispose()
+        app.processEvents()
+    finally:
+        materialId._window = None
+        dialog_class.get_mat_name = get_mat_name
+        for name, function in originals.items():
+            setattr(ui_class, name, function)
+    return recorder.results
+
+def compare(results, baseline):
+    """Prints phases whose time or Maya call counts changed against a baseline
+
+    Args:
+        results: The current phase results
+        baseline: The phase results of an earlier run
+    """
+    before = {(result['size'], result['phase']): result for result in baseline}
+    for result in results:
+        old = before.get((result['size'], result['phase']))
+        if old is None:
+            continue
+        changes = []
+        for name in sorted(set(result['calls']) | set(old['calls'])):
+            new_count = result['calls'].get(name, 0)
+            old_count = old['calls'].get(name, 0)
+            if new_count != old_count:
+                changes.append(f'{name} {old_count} -> {new_count}')
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] else 1.0
+        if changes or not 0.8 <= ratio <= 1.25:
+            print(f"{result['size']:>7} {result['phase']:<22} "
+                  f"time x{ratio:.2f}  {'; '.join(changes)}")
+
+def print_results(results):
+    """Prints a table of phase results
+
+    Args:
+        results: The phase results
+    """
+    print(f"{'size':>7} {'phase':<22} {'seconds':>10} {'peak kb':>9}  "
+          f"maya calls")
+    for result in results:
+        calls = ', '.join(f'{name}={count}'
+                          for name, count in sorted(result['calls'].items()))
+        print(f"{result['size']:>7} {result['phase']:<22} "
+              f"{result['seconds']:>10.4f} {result['peak_kb']:>9}  {calls}")
+
+def main(argv=None):
+    """Runs the benchmark command line
+
+    Args:
+        argv: Optional list of command line arguments, defaults to sys.argv
+
+    Returns:
+        int: The exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Library sizes to sweep')
+    parser.add_argument('--output', help='Write the results to a JSON file')
+    parser.add_argument('--compare',
+                        help='Report changes against an earlier JSON file')
+    args = parser.parse_args(argv)
+
+    try:
+        from PySide2 import QtCore, QtWidgets
+    except ImportError:
+        app = None
+        print('PySide2 is not installed, only UI-free phases are measured')
+    else:
+        QtCore.QSettings.setDefaultFormat(QtCore.QSettings.IniFormat)
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    results = []
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['MATERIAL_ID_CACHE'] = os.path.join(folder, 'cache')
+        if app is not None:
+            QtCore.QSettings.setPath(QtCore.QSettings.IniFormat,
+                                     QtCore.QSettings.UserScope, folder)
+        for size in args.sizes:
+            fakescene.reset()
+            mat_path = write_library(folder, size)
+            if app is None:
+                results.extend(bench_core(size, mat_path))
+            else:
+                results.extend(bench_ui(size, mat_path, app))
+    tracemalloc.stop()
+
+    print_results(results)
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            compare(results, json.load(baseline_file)['results'])
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'mode': 'core' if app is None else 'ui',
+                       'results': results}, output_file, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
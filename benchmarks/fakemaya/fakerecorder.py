@@ -0,0 +1,49 @@
+"""Call recorder shared by the fake Maya modules"""
+import collections
+
+calls = collections.Counter()
+
+def record(module, name):
+    """Counts one call of a fake Maya function
+
+    Args:
+        module: The short module name, for example 'cmds'
+        name: The function name
+    """
+    calls[f'{module}.{name}'] += 1
+
+def take_calls():
+    """Gets the calls recorded since the last take and resets the counter
+
+    Returns:
+        dict: A dict mapping function names to call counts
+    """
+    taken = dict(calls)
+    calls.clear()
+    return taken
+
+class RecordingModule(object):
+    """Module stand-in that counts every function call made through it"""
+    def __init__(self, name, functions):
+        """Initializes module from its implemented functions
+
+        Args:
+            name: The short module name used in the call counts
+            functions: A dict mapping function names to implementations,
+                functions that are not implemented return None
+        """
+        self._name = name
+        self._functions = functions
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        impl = self._functions.get(name)
+
+        def call(*args, **kwargs):
+            record(self._name, name)
+            if impl is not None:
+                return impl(*args, **kwargs)
+            return None
+        call.__name__ = name
+        return call
@@ -0,0 +1,152 @@
+"""Minimal in-memory Maya scene used by the fake maya.cmds and maya.mel"""
+import fnmatch
+import itertools
+import json
+import os
+import re
+
+nodes = {}
+connections = {}
+selection = []
+counter = itertools.count(1)
+current_file = [None]
+
+def reset():
+    """Empties the scene"""
+    nodes.clear()
+    connections.clear()
+    del selection[:]
+
+def unique_name(name, node_type):
+    """Gets a free node name the way Maya renames clashing nodes
+
+    Args:
+        name: The requested node name
+        node_type: Used as the base name if no name was requested
+
+    Returns:
+        string: The requested name or the name with a number appended
+    """
+    name = name or node_type + '1'
+    if name not in nodes:
+        return name
+    base = name.rstrip('0123456789')
+    for i in itertools.count(1):
+        if f'{base}{i}' not in nodes:
+            return f'{base}{i}'
+
+def create(node_type, name=None):
+    """Adds a node to the scene
+
+    Args:
+        node_type: The Maya node type
+        name: The requested node name
+
+    Returns:
+        string: The name of the new node
+    """
+    name = unique_name(name, node_type)
+    nodes[name] = node_type
+    return name
+
+def ls(*names, exactType=None, type=None, showType=False, sl=False, **kwargs):
+    """Lists scene nodes filtered by name patterns and types"""
+    if sl:
+        return list(selection)
+    if names and isinstance(names[0], (list, tuple)):
+        names = names[0]
+    types = exactType or type
+    if isinstance(types, str):
+        types = [types]
+    if names:
+        found = [node for pattern in names 
+                 for node in fnmatch.filter(nodes, pattern)]
+    else:
+        found = list(nodes)
+    if types:
+        found = [node for node in found if nodes[node] in types]
+    if showType:
+        return [item for node in found for item in (node, nodes[node])]
+    return found
+
+def delete(*names):
+    """Deletes nodes and their connections"""
+    if names and isinstance(names[0], (list, tuple)):
+        names = names[0]
+    for name in names:
+        nodes.pop(name, None)
+        connections.pop(name, None)
+
+def file(path=None, **kwargs):
+    """Opens, renames or saves a scene stored as a JSON file
+
+    The file holds a 'nodes' dict of node names to node types and a 
+    'members' dict of shading groups to member names. A file with a 'crash' 
+    exit code ends the process the way a Maya crash would.
+
+    Raises:
+        RuntimeError: An error occurs if the opened file does not exist
+    """
+    if kwargs.get('open'):
+        if not os.path.exists(path):
+            raise RuntimeError(f'File not found: {path}')
+        with open(path, 'r') as scene_file:
+            data = json.load(scene_file)
+        if 'crash' in data:
+            os._exit(data['crash'])
+        reset()
+        nodes.update(data.get('nodes', {}))
+        connections.update(data.get('members', {}))
+        current_file[0] = path
+    elif kwargs.get('rename'):
+        current_file[0] = kwargs['rename']
+    elif kwargs.get('save'):
+        with open(current_file[0], 'w') as scene_file:
+            json.dump({'nodes': nodes, 'members': connections}, scene_file)
+    return current_file[0]
+
+def select(*items, **kwargs):
+    """Replaces or clears the selection"""
+    del selection[:]
+    if items and not kwargs.get('clear'):
+        selection.extend(items[0] if isinstance(items[0], list) else items)
+
+def sets(*items, **kwargs):
+    """Creates an empty shading group or adds members to one"""
+    if kwargs.get('forceElement'):
+        members = items[0] if items and isinstance(items[0], list) else items
+        connections.setdefault(kwargs['forceElement'], []).extend(members)
+        return None
+    return create('shadingEngine', kwargs.get('name') or kwargs.get('n'))
+
+def list_connections(items=None, **kwargs):
+    """Lists set member or surface shader connections of shading group plugs
+
+    Shading groups are connected to the lambert of the same name without the 
+    SG suffix, as build_shaders creates them.
+    """
+    if isinstance(items, str):
+        items = [items]
+    result = []
+    for plug in items or []:
+        sg, _, attr = plug.partition('.')
+        if attr == 'surfaceShader':
+            if sg[:-2] in nodes:
+                result.extend([plug, sg[:-2]])
+            continue
+        for i, member in enumerate(connections.get(sg, [])):
+            result.extend([f'{sg}.dagSetMembers[{i}]', 
+                           f'{member}.instObjGroups[0]'])
+    return result
+
+NODE_PATTERN = re.compile(
+    r'shadingNode -asShader -skipSelect -name "([^"]+)" lambert|'
+    r'sets -renderable true -noSurfaceShader true -empty -name "([^"]+)"')
+
+def mel_eval(script):
+    """Creates the nodes a MEL batch from build_shaders would create"""
+    for lambert, sg in NODE_PATTERN.findall(script):
+        if lambert:
+            create('lambert', lambert)
+        else:
+            create('shadingEngine', sg)
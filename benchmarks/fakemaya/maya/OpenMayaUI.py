@@ -0,0 +1,13 @@
+"""Recording stand-in for maya.OpenMayaUI"""
+from fakerecorder import record
+
+class MQtUtil(object):
+    @staticmethod
+    def mainWindow():
+        record('OpenMayaUI', 'MQtUtil.mainWindow')
+        return 1
+
+    @staticmethod
+    def findControl(name):
+        record('OpenMayaUI', 'MQtUtil.findControl')
+        return 2
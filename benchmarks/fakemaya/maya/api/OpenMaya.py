@@ -0,0 +1,39 @@
+"""Stand-in for the parts of maya.api.OpenMaya used for callbacks"""
+import itertools
+
+from fakerecorder import record
+
+callback_ids = itertools.count(1)
+
+class MObject(object):
+    kNullObj = None
+
+class MFn(object):
+    kShadingEngine = 'kShadingEngine'
+    kMesh = 'kMesh'
+
+class MDGMessage(object):
+    @staticmethod
+    def addConnectionCallback(function, client_data=None):
+        record('OpenMaya', 'MDGMessage.addConnectionCallback')
+        return next(callback_ids)
+
+class MNodeMessage(object):
+    @staticmethod
+    def addNameChangedCallback(node, function, client_data=None):
+        record('OpenMaya', 'MNodeMessage.addNameChangedCallback')
+        return next(callback_ids)
+
+class MSceneMessage(object):
+    kAfterOpen = 'kAfterOpen'
+    kAfterNew = 'kAfterNew'
+
+    @staticmethod
+    def addCallback(message, function, client_data=None):
+        record('OpenMaya', 'MSceneMessage.addCallback')
+        return next(callback_ids)
+
+class MMessage(object):
+    @staticmethod
+    def removeCallbacks(ids):
+        record('OpenMaya', 'MMessage.removeCallbacks')
@@ -0,0 +1,28 @@
+"""Recording stand-in for maya.cmds backed by a minimal in-memory scene"""
+import sys
+
+from fakerecorder import RecordingModule
+import fakescene as scene
+
+def window(*args, **kwargs):
+    if kwargs.get('exists'):
+        return False
+    return 'window1'
+
+sys.modules[__name__] = RecordingModule('cmds', {
+    'ls': scene.ls,
+    'delete': scene.delete,
+    'file': scene.file,
+    'select': scene.select,
+    'sets': scene.sets,
+    'listConnections': scene.list_connections,
+    'shadingNode': lambda node_type, **kwargs: scene.create(
+        node_type, kwargs.get('name') or kwargs.get('n')),
+    'createNode': lambda node_type, **kwargs: scene.create(
+        node_type, kwargs.get('name') or kwargs.get('n')),
+    'objExists': lambda name: name in scene.nodes,
+    'getAttr': lambda plug: [],
+    'window': window,
+    'columnLayout': lambda *args, **kwargs: 'columnLayout1',
+    'swatchDisplayPort': lambda *args, **kwargs: 'swatchDisplayPort1',
+})
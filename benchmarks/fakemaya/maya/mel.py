@@ -0,0 +1,7 @@
+"""Recording stand-in for maya.mel"""
+import sys
+
+from fakerecorder import RecordingModule
+import fakescene as scene
+
+sys.modules[__name__] = RecordingModule('mel', {'eval': scene.mel_eval})
@@ -0,0 +1,6 @@
+"""Stand-in for maya.standalone"""
+def initialize(name=None):
+    pass
+
+def uninitialize():
+    pass
@@ -0,0 +1,19 @@
+"""Recording stand-in for shiboken2 that hands out real Qt widgets"""
+from fakerecorder import record
+
+widgets = {}
+
+def wrapInstance(pointer, cls):
+    """Gets a persistent Qt widget for a fake pointer
+
+    Args:
+        pointer: The fake pointer returned by the fake OpenMayaUI
+        cls: The Qt class to create
+
+    Returns:
+        A widget of the requested class
+    """
+    record('shiboken2', 'wrapInstance')
+    if pointer not in widgets:
+        widgets[pointer] = cls()
+    return widgets[pointer]
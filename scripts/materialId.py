@@ -1,26 +1,27 @@
-import colorsys 
-import fnmatch
-import random
+import collections
+import os
+import sys
 
+import maya.api.OpenMaya as om
 import maya.OpenMayaUI as omui
 import maya.cmds as cmds 
-from PySide2 import QtCore, QtWidgets
+from PySide2 import QtCore, QtGui, QtWidgets
 from shiboken2 import wrapInstance
 
-# Custom UI class and functions
-class ResizableButton(QtWidgets.QPushButton):
-    """Resize push button for custom dialog box"""
-    def sizeHint(self):
-        """
-        Gets size hint of a button based on its layout
-
-        Returns:
-            A default size hint or a size hint based on content
-        """
-        if self.layout():
-            return self.layout().sizeHint()
-        return super().sizeHint()
+from materialIdCore import (AssignmentRules, MaterialMemberIndex, 
+                            MaterialSearchIndex, MaterialStore, PaletteStore, 
+                            assign_by_rules, assign_faces, bake_id_colors, 
+                            build_shaders, capture_assignments, 
+                            delete_shaders, export_id_table, file_signature, 
+                            index_runs, instrumentation, 
+                            is_valid_material_name, load_material_library, 
+                            load_snapshot, parse_material_file, 
+                            read_face_selection, read_unused_materials, 
+                            reconcile_shaders, 
+                            restore_assignments, save_snapshot, 
+                            snapshot_names, split_material_names)
 
+# Custom UI class and functions
 class NoEmptyStringDialog(QtWidgets.QDialog):
     """Custom Dialog Box that requires user input to not be empty"""
     def __init__(self, parent=None, window_name='', label=None):
@@ -84,6 +85,203 @@ class NoEmptyStringDialog(QtWidgets.QDialog):
             self.btn_accept.setEnabled(True)
             self.error_msg.setText('')
 
+class SwatchCache(object):
+    """LRU cache of swatch pixmaps drawn straight from material colors
+
+    Every material is a flat lambert, so a swatch is just its color and never
+    needs Maya's renderer. The cache lives on the class so it is shared by 
+    every window instance and survives reopening the tool.
+    """
+    cache = collections.OrderedDict()
+    cache_size = 4096
+
+    @classmethod
+    def pixmap(cls, color, size=32):
+        """Gets the swatch of a color, drawing it only on a cache miss
+
+        Args:
+            color: A tuple of three floats that define a RGB color value
+            size: Width and height of the swatch in pixels
+
+        Returns:
+            QPixmap: The swatch pixmap
+        """
+        key = tuple(int(round(channel * 255)) for channel in color) + (size,)
+        cache = cls.cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        qcolor = QtGui.QColor(*key[:3])
+        pixmap = QtGui.QPixmap(size, size)
+        pixmap.fill(qcolor)
+        painter = QtGui.QPainter(pixmap)
+        painter.setPen(qcolor.darker(150))
+        painter.drawRect(0, 0, size - 1, size - 1)
+        painter.end()
+
+        cache[key] = pixmap
+        if len(cache) > cls.cache_size:
+            cache.popitem(last=False)
+        return pixmap
+
+class MaterialListModel(QtCore.QAbstractListModel):
+    """List model of material names that draws swatches only when a row is shown
+
+    The rows are either every material or the filtered materials set with 
+    set_rows(), so filtering resets the model instead of touching widgets.
+    """
+    MemberCountRole = QtCore.Qt.UserRole + 1
+
+    def __init__(self, mat_list, colors, member_index=None, parent=None):
+        """Initializes model based on a material list
+
+        Args:
+            mat_list: A list of material names
+            colors: A dict mapping material names to a RGB color value
+            member_index: Optional MaterialMemberIndex used for member counts
+            parent: Defines QObject that the instance is a child of
+        """
+        super(MaterialListModel, self).__init__(parent)
+        self.mat_list = list(mat_list)
+        self.rows = self.mat_list
+        self.colors = colors
+        self.member_index = member_index
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Gets number of materials in the model
+
+        Returns:
+            int: Number of rows, zero for child indices
+        """
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Gets the name, swatch or status tip of a material row
+
+        Args:
+            index: Defines the model index of the row
+            role: Defines the kind of data requested by the view
+
+        Returns:
+            The data for the role or None
+        """
+        if not index.isValid():
+            return None
+        mat = self.rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return mat
+        if role == QtCore.Qt.DecorationRole and mat in self.colors:
+            return SwatchCache.pixmap(self.colors[mat])
+        if role == QtCore.Qt.StatusTipRole:
+            return ('Left Click to Apply Material, Ctrl Click to Apply to '
+                    'Whole Shells, Right Click to Select Objects...')
+        if role == self.MemberCountRole and self.member_index is not None:
+            return self.member_index.count(mat + 'SG')
+        return None
+
+    def set_rows(self, rows=None):
+        """Shows only the given materials
+
+        Args:
+            rows: A list of material names, or None to show every material
+        """
+        self.beginResetModel()
+        self.rows = self.mat_list if rows is None else rows
+        self.endResetModel()
+
+    def sync(self, mat_list):
+        """Removes and inserts only the rows that changed for a new material list
+
+        While filtered, only the list is replaced and the owner sets the 
+        filtered rows again.
+
+        Args:
+            mat_list: The new list of material names
+        """
+        if self.rows is not self.mat_list:
+            self.mat_list = list(mat_list)
+            return
+        root = QtCore.QModelIndex()
+        wanted = set(mat_list)
+        removed = [i for i, mat in enumerate(self.mat_list) 
+                   if mat not in wanted]
+        for first, last in reversed(list(index_runs(removed))):
+            self.beginRemoveRows(root, first, last)
+            del self.mat_list[first:last + 1]
+            self.endRemoveRows()
+
+        # Reordered lists cannot be expressed as inserts
+        current = set(self.mat_list)
+        if [mat for mat in mat_list if mat in current] != self.mat_list:
+            self.beginResetModel()
+            self.mat_list = list(mat_list)
+            self.rows = self.mat_list
+            self.endResetModel()
+            return
+
+        added = [i for i, mat in enumerate(mat_list) if mat not in current]
+        for first, last in index_runs(added):
+            self.beginInsertRows(root, first, last)
+            self.mat_list[first:first] = mat_list[first:last + 1]
+            self.endInsertRows()
+
+class MaterialButtonDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints material rows as push buttons with a swatch and a label"""
+    def paint(self, painter, option, index):
+        """Draws the button frame, swatch and material name of a row
+
+        Args:
+            painter: Defines the QPainter of the view
+            option: Defines the style options of the row
+            index: Defines the model index of the row
+        """
+        widget = option.widget
+        style = widget.style() if widget else QtWidgets.QApplication.style()
+
+        btn_option = QtWidgets.QStyleOptionButton()
+        btn_option.rect = option.rect.adjusted(1, 1, -1, -1)
+        btn_option.state = option.state | QtWidgets.QStyle.State_Raised
+        btn_option.palette = option.palette
+        style.drawControl(QtWidgets.QStyle.CE_PushButton, btn_option, 
+                          painter, widget)
+
+        painter.save()
+        rect = btn_option.rect.adjusted(6, 0, -6, 0)
+        pixmap = index.data(QtCore.Qt.DecorationRole)
+        if pixmap is not None:
+            top = rect.top() + (rect.height() - pixmap.height()) // 2
+            painter.drawPixmap(rect.left(), top, pixmap)
+            rect.setLeft(rect.left() + pixmap.width())
+        painter.setPen(option.palette.color(QtGui.QPalette.ButtonText))
+        painter.drawText(rect, QtCore.Qt.AlignCenter, 
+                         index.data(QtCore.Qt.DisplayRole))
+
+        count = index.data(MaterialListModel.MemberCountRole)
+        if count:
+            painter.setPen(option.palette.color(QtGui.QPalette.Mid))
+            painter.drawText(rect, QtCore.Qt.AlignRight | QtCore.Qt.AlignBottom,
+                             str(count))
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        """Gets the fixed size of a material button
+
+        Returns:
+            QSize: The size of a single button
+        """
+        return QtCore.QSize(120, 44)
+
+# Time to wait for a burst of writes to the material file to settle
+RELOAD_DELAY_MS = 500
+
+# Performance recording is opt-in and remembered between sessions
+if QtCore.QSettings('KYBER', 'MaterialIDGenerator').value(
+        'recordPerformance', False, type=bool):
+    instrumentation.enable([sys.modules[__name__]])
+
 # Main UI class and functions
 def main_window():
     """Gets the Maya main window widget
@@ -97,9 +295,13 @@ def main_window():
 
 class MaterialUI(QtWidgets.QDialog):
     """Custom Material ID dialog box"""
-    def __init__(self, parent=main_window()):
+    @instrumentation.timed('open')
+    def __init__(self, parent=None):
         """Initializes instance based on window and label name
 
+        Closing the window only hides it, use show() to reopen the same 
+        window and dispose() to delete it.
+
         Args:
             parent: Defines QObject that the instance is a child of
         """
@@ -108,11 +310,27 @@ class MaterialUI(QtWidgets.QDialog):
         self.setObjectName('MaterialIdUI')
         self.setWindowTitle('Material ID Generator')
         self.resize(400, 400)
-        self.setAttribute(QtCore.Qt.WA_DeleteOnClose) # Ensures cleanup
 
         self.settings = QtCore.QSettings('KYBER', 'MaterialIDGenerator')
         self.first = False
+        self.shader_colors = {}
+        self.scene_changed = False
+        self.member_index = MaterialMemberIndex()
+        self.scene_callback_ids = [
+            om.MSceneMessage.addCallback(message, self.on_scene_changed)
+            for message in (om.MSceneMessage.kAfterOpen, 
+                            om.MSceneMessage.kAfterNew)]
+
+        # Edits to the material file are reloaded once writes settle
+        self.file_watcher = QtCore.QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_mat_file_changed)
+        self.reload_timer = QtCore.QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(RELOAD_DELAY_MS)
+        self.reload_timer.timeout.connect(self.reload_mat_file)
+
         self.mat_list = self.create_material_list()
+        self.search_index = MaterialSearchIndex(self.mat_list)
         max_col = self.load_column_settings()
 
         self.create_shaders()
@@ -184,6 +402,7 @@ class MaterialUI(QtWidgets.QDialog):
         
         return mat_path
 
+    @instrumentation.timed('create_material_list')
     def create_material_list(self):
         """Creates list of materials based on txt file
 
@@ -191,9 +410,13 @@ class MaterialUI(QtWidgets.QDialog):
             list[str]: A list of strings parsed from contents of txt file
         """
         mat_path = self.load_material_path()
-        with open(mat_path, 'r') as mat_file:
-            mat_list = mat_file.read().splitlines()
-        return mat_list
+        self.library = load_material_library(mat_path)
+        self.store = MaterialStore(mat_path, self.library.names)
+        self.watch_mat_file(mat_path)
+        if self.library.issues:
+            cmds.warning(f'{len(self.library.issues)} lines were skipped in '
+                         f'{mat_path}, see About > Show Material Info')
+        return list(self.library.names)
 
     def update_mat_file(self):
         """Opens dialog box for user to select material txt file"""
@@ -203,194 +426,501 @@ class MaterialUI(QtWidgets.QDialog):
         settings = self.settings
 
         if mat_path:
-            self.close_window_if_exists()
             settings.setValue('matListPath', mat_path)
-            ui = MaterialUI()
-            ui.show()
+            self.sync_material_list(self.create_material_list())
         
-    # Shader creation methods
-    def rand_color(self):
-        """Creates list of random colors
+    def watch_mat_file(self, mat_path):
+        """Watches a material file instead of the previously watched one
 
-        Returns:
-            list[tuple[float, float, float]]: A list of tuples made up of three 
-            float numbers that define a RGB color value
+        Args:
+            mat_path: The path of the material file
+        """
+        watched = self.file_watcher.files()
+        if watched != [mat_path]:
+            if watched:
+                self.file_watcher.removePaths(watched)
+            if os.path.exists(mat_path):
+                self.file_watcher.addPath(mat_path)
+
+    def on_mat_file_changed(self, mat_path):
+        """Restarts the reload delay so a burst of writes causes one reload
+
+        Args:
+            mat_path: The path of the changed file
         """
-        # comment out seed line to randomize palette on every run 
-        # or change the seed to get different color palettes
-        random.seed(80)
+        self.reload_timer.start()
 
-        # use HSV to get distinct colors
-        color_list = [i/len(self.mat_list) for i in range(len(self.mat_list))]
-        hsv_colors = [(random.choice(color_list), 1, random.random()) 
-                      for i in range(len(self.mat_list))]
+    @instrumentation.timed('reload')
+    def reload_mat_file(self):
+        """Applies the materials another session added or removed from the file
 
-        # convert HSV to RGB
-        rgb_colors = [colorsys.hsv_to_rgb(*hsv) for hsv in hsv_colors]
-        return rgb_colors
+        Saving by replacing the file removes it from the watcher, so it is 
+        watched again here. Hidden windows skip the reload because refresh() 
+        picks up the change on the next show. Removed materials only lose 
+        their buttons, their shader nodes are left to reconcile.
+        """
+        mat_path = self.store.path
+        if not os.path.exists(mat_path):
+            # The file is being replaced, wait for the new one
+            self.reload_timer.start()
+            return
+        if mat_path not in self.file_watcher.files():
+            self.file_watcher.addPath(mat_path)
+        if (self.isVisible() and 
+                file_signature(mat_path) != self.store.signature):
+            self.sync_material_list(self.create_material_list())
 
+    # Shader creation methods
     def populate_shader_dict(self):
-        """Assigns each material to a random color
+        """Assigns each material to a distinct palette color
+
+        Materials that already have a saved color keep it, only new materials
+        get new colors. The palette file is read again for every new material 
+        because other sessions add colors to it.
 
         Returns:
             A dict mapping material names to a RGB color value
             Each name is represented as a tuple of floats. For
             example:
 
-            {'Material1': (255, 255, 255),
-            'Material2': (0, 0, 0)}
+            {'Material1': (1.0, 0.2, 0.1),
+            'Material2': (0.1, 0.4, 0.9)}
         """
-        color_list = self.rand_color()
-        shader_dict = {mat: color for mat, color in zip(self.mat_list, color_list)}
-        return shader_dict
+        colors = self.library.colors
+        if any(mat not in colors for mat in self.mat_list):
+            palette = PaletteStore(self.settings.value('matListPath'))
+            colors.update(palette.assign(self.mat_list))
+        return {mat: colors[mat] for mat in self.mat_list}
 
-    def create_shaders(self):
-        """Creates lambert shading node and shading group for each material in Maya"""
+    @instrumentation.timed('create_shaders')
+    def create_shaders(self, names=None):
+        """Creates lambert shading node and shading group for each material in Maya
+
+        The report of a pass over every material replaces the shader report, 
+        the counts of a pass over some materials are added to it.
+
+        Args:
+            names: Optional list of materials to create, defaults to every material
+        """
         shader_dict = self.populate_shader_dict()
-        for name, color in shader_dict.items():
-            mat = cmds.shadingNode('lambert', asShader=True, n=name, 
-                                   shared=True, ss=True)
-            cmds.setAttr(name + '.color', *color)
-
-            # Create shader groups only if they do not exist
-            sg_list = cmds.ls(type='shadingEngine')
-            sg_filter = fnmatch.filter(sg_list, f'{name}*')
-            if len(sg_filter) == 0:
-                sg = cmds.sets(n=name + 'SG', em=True, r=True, nss=True)
-                cmds.connectAttr(mat + '.outColor', sg + '.surfaceShader',
-                                 f=True)
+        if names is not None:
+            shader_dict = {name: shader_dict[name] for name in names}
+        self.shader_colors.update(shader_dict)
+        with self.member_index.paused():
+            report = build_shaders(shader_dict)
+        if names is None:
+            self.shader_report = report
+        else:
+            self.shader_report.add(report)
+
+    def sync_material_list(self, mat_list, delete_removed=False):
+        """Applies the difference between the current and a new material list in place
+
+        Only the added materials get shaders created and only the changed rows
+        are inserted or removed from the model, so one edit costs a constant 
+        number of Maya calls instead of a full window rebuild.
+
+        Args:
+            mat_list: The new list of material names
+            delete_removed: Deletes the shader nodes of removed materials if True
+        """
+        old_list = self.mat_list
+        current = set(old_list)
+        wanted = set(mat_list)
+        added = [mat for mat in mat_list if mat not in current]
+        removed = [mat for mat in old_list if mat not in wanted]
+        self.mat_list = mat_list
+
+        if added:
+            self.create_shaders(added)
+        if removed:
+            if delete_removed:
+                with self.member_index.paused():
+                    delete_shaders(removed)
+            for mat in removed:
+                self.shader_colors.pop(mat, None)
+        self.search_index.sync(mat_list)
+        self.mat_model.sync(mat_list)
+        if self.filter_box.text():
+            self.filter_buttons(self.filter_box.text())
             
     # Shader manipulation methods
-    def apply_mat(self, btn):
-        """Sets hyperShade material to the material button selected by the user 
+    @instrumentation.timed('apply')
+    def apply_mat(self, mat_name, flood=False):
+        """Assigns the material of the button selected by the user to the selection
+
+        All selected objects and faces are added to the shading group with 
+        one call inside a single undo step.
 
         Args:
-            btn: Defines the QWidget button that was selected by the user
+            mat_name: The name of the material button selected by the user
+            flood: Assigns the whole shells of the selected faces if True
         """
-        mat_name = btn.findChild(QtWidgets.QLabel).text()
-        cmds.hyperShade(a=mat_name)
+        self.assign_selection(mat_name + 'SG', flood)
 
+    @instrumentation.timed('reset')
     def reset_mat(self):
-        """Sets hyperShade material to default lambert1"""
-        cmds.hyperShade(a='lambert1')
+        """Assigns the default lambert1 material to the selection"""
+        self.assign_selection('initialShadingGroup')
+
+    def assign_selection(self, sg, flood=False):
+        """Assigns the selected objects and faces to a shading group
 
-    def select_obj(self, btn):
+        Selected faces are read as index arrays per mesh rather than as 
+        component strings.
+
+        Args:
+            sg: The shading group name
+            flood: Assigns the whole shells of the selected faces if True
+        """
+        objects, faces = read_face_selection()
+        if not objects and not faces:
+            cmds.warning('No renderable object is selected for assignment')
+            return
+        if not cmds.objExists(sg):
+            cmds.warning(f'{sg} does not exist, use Options > Reconcile Scene '
+                         'Shaders to create it')
+            return
+        faces.update((obj, None) for obj in objects)
+        with self.member_index.paused():
+            assign_faces({sg: faces}, flood)
+
+    @instrumentation.timed('select')
+    def select_obj(self, mat_name):
         """Selects Maya objects that have the material of the button selected by the user
 
+        The objects come from the member index instead of a scene scan.
+
+        Args:
+            mat_name: The name of the material button selected by the user
+        """
+        members = self.member_index.selection(mat_name + 'SG')
+        if members:
+            cmds.select(members, replace=True)
+        else:
+            cmds.select(clear=True)
+
+    @instrumentation.timed('assign_rules')
+    def assign_rules(self):
+        """Opens dialog box for user to assign materials from a rules txt file
+
+        The rules are applied to the meshes under the selection or to every 
+        mesh in the scene if nothing is selected.
+        """
+        choose_file = QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Choose Rules File', filter="*.txt")
+        rules_path = choose_file[0]
+        if not rules_path:
+            return
+
+        rules = AssignmentRules.from_file(rules_path)
+        unknown = sorted(set(rules.materials) - self.store.index)
+        if unknown:
+            cmds.warning(f'Rules use materials that are not in the material '
+                         f'list: {", ".join(unknown)}')
+
+        with self.member_index.paused():
+            assigned, missing = assign_by_rules(rules, self.target_meshes())
+        if missing:
+            cmds.warning(f'Missing shading groups for: {", ".join(missing)}')
+        om.MGlobal.displayInfo(f'Assigned {sum(assigned.values())} meshes '
+                               f'to {len(assigned)} materials')
+
+    def target_meshes(self):
+        """Gets the meshes under the selection
+
+        Returns:
+            list[str]: Long mesh shape names, or None if nothing is selected 
+            so every mesh in the scene is used
+        """
+        if not cmds.ls(sl=True):
+            return None
+        return cmds.ls(sl=True, dag=True, type='mesh', long=True, 
+                       noIntermediate=True) or []
+
+    # Export methods
+    def bake_colors(self):
+        """Opens dialog box for user to bake material ID colors into a color set
+
+        The selected meshes are baked, or every mesh if nothing is selected.
+        """
+        modes = ['Per Face', 'Per Vertex']
+        mode, ok = QtWidgets.QInputDialog.getItem(
+            self, 'Bake Material IDs', 'Color Set Colors:', modes, 0, False)
+        if not ok:
+            return
+        baked = bake_id_colors(self.mat_list, self.shader_colors, 
+                               self.target_meshes(), 
+                               per_vertex=mode == 'Per Vertex')
+        om.MGlobal.displayInfo(f'Baked material ID colors of {baked} faces')
+
+    def export_table(self):
+        """Opens dialog box for user to save the face to material ID table
+
+        The selected meshes are exported, or every mesh if nothing is selected.
+        """
+        choose_file = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Export Material ID Table', 'materialIds.csv', 
+            filter="CSV (*.csv);;JSON Lines (*.jsonl)")
+        table_path = choose_file[0]
+        if table_path:
+            count = export_id_table(table_path, self.mat_list, 
+                                    self.target_meshes())
+            om.MGlobal.displayInfo(f'Exported material IDs of {count} '
+                                   f'meshes to {table_path}')
+
+    # Snapshot methods
+    def take_snapshot(self):
+        """Opens dialog box for user to save the current assignments as a named snapshot
+
+        The selected meshes are captured, or every mesh if nothing is 
+        selected. The snapshot is stored in the scene file info, so it is 
+        kept when the scene is saved.
+        """
+        name, ok = QtWidgets.QInputDialog.getText(
+            self, 'Save Assignment Snapshot', 'Snapshot Name:', 
+            text='lookdev')
+        if not ok:
+            return
+        if not is_valid_material_name(name):
+            cmds.warning(f'Snapshot names may only contain letters, digits '
+                         f'and underscores: {name!r}')
+            return
+        snapshot = capture_assignments(self.target_meshes())
+        save_snapshot(name, snapshot)
+        om.MGlobal.displayInfo(f'Saved assignments of '
+                               f'{len(snapshot["meshes"])} meshes as '
+                               f'snapshot {name}')
+
+    def restore_snapshot(self):
+        """Opens dialog box for user to restore a snapshot stored in the scene"""
+        names = snapshot_names()
+        if not names:
+            cmds.warning('The scene has no assignment snapshots, use '
+                         'Snapshots > Save Assignment Snapshot first')
+            return
+        name, ok = QtWidgets.QInputDialog.getItem(
+            self, 'Restore Assignment Snapshot', 'Snapshot:', names, 0, False)
+        if not ok:
+            return
+        with self.member_index.paused():
+            restored, missing = restore_assignments(load_snapshot(name))
+        if missing:
+            cmds.warning(f'Missing shading groups for: {", ".join(missing)}')
+        om.MGlobal.displayInfo(f'Restored assignments of {restored} meshes '
+                               f'from snapshot {name}')
+
+    @instrumentation.timed('reconcile')
+    def reconcile_scene(self):
+        """Shows and applies the changes that match the scene shaders to the list
+
+        Materials that still have a saved palette color but were removed from 
+        the list count as retired, so their leftover nodes are deleted unless 
+        objects still use them.
+        """
+        shader_dict = self.populate_shader_dict()
+        palette = PaletteStore(self.settings.value('matListPath'))
+        retired = [mat for mat in palette.colors if mat not in self.store]
+        report = reconcile_shaders(shader_dict, retired, dry_run=True)
+        if not report:
+            QtWidgets.QMessageBox.information(
+                self, 'Reconcile Scene Shaders', 
+                'The scene shaders already match the material list.\n\n' + 
+                '\n'.join(report.lines()))
+            return
+
+        lines = report.lines(limit=30)
+        more = len(report.lines()) - len(lines)
+        answer = QtWidgets.QMessageBox.question(
+            self, 'Reconcile Scene Shaders', 
+            f'{report}.\n\n' + '\n'.join(lines) + 
+            (f'\n... and {more} more' if more > 0 else '') + 
+            '\n\nApply these changes?')
+        if answer == QtWidgets.QMessageBox.Yes:
+            with self.member_index.paused():
+                reconcile_shaders(shader_dict, retired)
+
+    @instrumentation.timed('add')
+    def add_materials(self, names):
+        """Adds many materials to the file, the scene and the UI in one pass
+
+        Args:
+            names: A list of material names to add
+
+        Returns:
+            list[str]: The names that were added
+        """
+        try:
+            added = self.store.add_many(names)
+        except OSError as error:
+            cmds.warning(f'Could not write {self.store.path}: {error}')
+            return []
+        if added:
+            self.sync_material_list(list(self.store.names))
+        return added
+
+    @instrumentation.timed('delete')
+    def delete_materials(self, names):
+        """Deletes many materials from the file, the scene and the UI in one pass
+
         Args:
-            btn: Defines the QWidget button that was selected by the user
+            names: A list of material names to delete
+
+        Returns:
+            list[str]: The names that were deleted
+        """
+        try:
+            deleted = self.store.delete_many(names)
+        except OSError as error:
+            cmds.warning(f'Could not write {self.store.path}: {error}')
+            return []
+        if deleted:
+            self.sync_material_list(list(self.store.names), 
+                                    delete_removed=True)
+        return deleted
+
+    def prune_unused(self):
+        """Opens dialog box for user to delete the IDs a usage report found unused
+
+        The report is the totals file written by materialIdBatch.py --usage.
         """
-        mat_name = btn.findChild(QtWidgets.QLabel).text()
-        cmds.hyperShade(o=mat_name)
+        choose_file = QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Choose Usage Report', 
+            filter="Usage Reports (*.csv *.jsonl)")
+        report_path = choose_file[0]
+        if not report_path:
+            return
+        try:
+            unused = [mat for mat in read_unused_materials(report_path) 
+                      if mat in self.store]
+        except ValueError as error:
+            cmds.warning(f'{error}, IDs used only in the failed scenes would '
+                         'be deleted')
+            return
+        if not unused:
+            QtWidgets.QMessageBox.information(
+                self, 'Prune Unused Material IDs', 
+                'The report has no unused material IDs in the current list.')
+            return
+
+        preview = ', '.join(unused[:30])
+        if len(unused) > 30:
+            preview += f' and {len(unused) - 30} more'
+        answer = QtWidgets.QMessageBox.question(
+            self, 'Prune Unused Material IDs', 
+            f'Delete {len(unused)} material IDs that no scene uses?\n\n' + 
+            preview)
+        if answer == QtWidgets.QMessageBox.Yes:
+            self.delete_materials(unused)
 
     def add_new_mat(self):
-        """Opens dialog box for user to add a new material to their list"""        
+        """Opens dialog box for user to add new materials to their list"""        
         # Get user input within popup UI
         dlg = NoEmptyStringDialog(self, 'Add New Material', 
-                                  'New Material Name:')
+                                  'New Material Names:')
 
         def exists_error(text):
-            if text in self.mat_list:
-                dlg.error_msg.setText('Material name already exists!')
+            names = split_material_names(text)
+            exists = [name for name in names if name in self.store]
+            invalid = [name for name in names 
+                       if not is_valid_material_name(name)]
+            if exists:
+                dlg.error_msg.setText(f'Material name already exists: '
+                                      f'{exists[0]}!')
+                dlg.btn_accept.setEnabled(False)
+            elif invalid:
+                dlg.error_msg.setText('Material name can only use letters, '
+                                      f'digits and underscores: {invalid[0]}!')
                 dlg.btn_accept.setEnabled(False)
-            if text and text not in self.mat_list:
+            elif names:
                 dlg.error_msg.setText('')
                 dlg.btn_accept.setEnabled(True)
         
+        dlg.mat_name.setPlaceholderText('Separate names with spaces or commas')
         dlg.mat_name.textChanged.connect(exists_error)
-        new_mat = dlg.get_mat_name()
-        # Add new material to txt file
-        if new_mat:
-            with open(self.settings.value('matListPath'), 'a') as mat_file:
-                mat_file.write('\n' + new_mat)
-
-            # Rerun main UI with new material added
-            added = False
-            with open(self.settings.value('matListPath'), 'r') as mat_file:
-                if new_mat in mat_file:
-                    added = True
-            if added:
-                self.close_window_if_exists()          
-                ui = MaterialUI()
-                ui.show()
+        new_mats = dlg.get_mat_name()
+        if new_mats:
+            self.add_materials(split_material_names(new_mats))
+
+    def import_mats(self):
+        """Opens dialog box for user to add every material of another txt file"""
+        choose_file = QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Import Material IDs', filter="*.txt")
+        import_path = choose_file[0]
+        if import_path:
+            names, issues = parse_material_file(import_path)
+            added = self.add_materials(names)
+            if issues:
+                cmds.warning(f'{len(issues)} lines were skipped in '
+                             f'{import_path}')
+            om.MGlobal.displayInfo(f'Imported {len(added)} new materials '
+                                   f'from {import_path}')
 
     def delete_mat(self):
-        """Opens dialog box that allows user to remove material from their list"""
+        """Opens dialog box that allows user to remove materials from their list"""
         # Get user input within popup UI
         dlg = NoEmptyStringDialog(self, 'Delete Material', 
-                                  'Material to Delete:')
+                                  'Materials to Delete:')
         
         def not_exists_error(text):
-            if text not in self.mat_list:
-                dlg.error_msg.setText('Material name does not exist!')
+            names = split_material_names(text)
+            missing = [name for name in names if name not in self.store]
+            if missing:
+                dlg.error_msg.setText(f'Material name does not exist: '
+                                      f'{missing[0]}!')
                 dlg.btn_accept.setEnabled(False)
-            if text in self.mat_list:
+            elif names:
                 dlg.error_msg.setText('')
                 dlg.btn_accept.setEnabled(True)
         
+        dlg.mat_name.setPlaceholderText('Separate names with spaces or commas')
         dlg.mat_name.textChanged.connect(not_exists_error)
-        mat_to_del = dlg.get_mat_name()
-        
-        if mat_to_del:
-            corr_lines = []
-
-            with open(self.settings.value('matListPath'), 'r+') as mat_input:
-                lines = mat_input.readlines()
-
-            # Delete material from txt file
-            with open(self.settings.value('matListPath'), 'w') as mat_output:
-                for line in lines:
-                    if line.strip('\n') != mat_to_del:
-                        corr_lines.append(line)
-                
-                # Remove extra empty line if deleted name is at end of file
-                # Empty lines will break shader creation
-                for i in range(len(corr_lines)):
-                    if i == len(corr_lines)-1:
-                        corr_lines[i] = corr_lines[i].strip('\n')
-                
-                for name in corr_lines:
-                    mat_output.write(name)
-          
-            # Delete material from Maya
-            cmds.delete(mat_to_del)
-            cmds.delete(mat_to_del + 'SG')
-
-            # Rerun main UI with material deleted
-            deleted = False
-            with open(self.settings.value('matListPath'), 'r') as mat_file:
-                if mat_to_del not in mat_file:
-                    deleted = True
-
-            if deleted:
-                self.close_window_if_exists()
-                ui = MaterialUI()
-                ui.show()
+        mats_to_del = dlg.get_mat_name()
+        if mats_to_del:
+            self.delete_materials(split_material_names(mats_to_del))
 
     # Custom shader button mouse events
     def eventFilter(self, QObject, event):
         """Defines tool behavior based on the mouse button a user presses
 
         Args:
-            QObject: Defines the mouse button that was selected by the user
+            QObject: Defines the viewport of the material view
             event: Defines the QEvent that triggers different behavior
 
         Returns:
-            bool: False if event type is not a mouse button press
+            bool: False so the view still receives the event
         """
+        if event.type() == QtCore.QEvent.Resize:
+            self.reflow_buttons()
         if event.type() == QtCore.QEvent.MouseButtonPress:
+            index = self.mat_view.indexAt(event.pos())
+            if not index.isValid():
+                return False
+            mat_name = index.data(QtCore.Qt.DisplayRole)
             if event.button() == QtCore.Qt.RightButton:
-                clicked_button = QObject
-                self.select_obj(clicked_button)
+                self.select_obj(mat_name)
             if event.button() == QtCore.Qt.LeftButton:
                 if event.modifiers() == QtCore.Qt.ShiftModifier:
-                    clicked_button = QObject
-                    self.select_obj(clicked_button)
+                    self.select_obj(mat_name)
+                elif event.modifiers() == QtCore.Qt.ControlModifier:
+                    self.apply_mat(mat_name, flood=True)
                 else:
-                    clicked_button = QObject
-                    self.apply_mat(clicked_button)
+                    self.apply_mat(mat_name)
         return False
            
+    # Filter methods
+    @instrumentation.timed('filter')
+    def filter_buttons(self, text):
+        """Shows only the material buttons whose names match the filter text
+
+        Args:
+            text: The filter text, every button is shown if empty
+        """
+        if not text.strip():
+            self.mat_model.set_rows()
+            return
+        self.mat_model.set_rows(self.search_index.search(text))
+
     # Custom column methods
     def get_column_input(self):
         """Gets user input for how many columns of buttons in the user interface window"""
@@ -402,9 +932,8 @@ class MaterialUI(QtWidgets.QDialog):
         
         if ok:
             settings.setValue('numOfColumns', col_input)
-            self.close_window_if_exists()
-            ui = MaterialUI()
-            ui.show()
+            self.max_col = col_input
+            self.reflow_buttons()
 
     def load_column_settings(self):
         """Gets saved setting for how many columns of buttons in the user interface window and sets default
@@ -414,7 +943,7 @@ class MaterialUI(QtWidgets.QDialog):
         """
         settings = self.settings
         if settings.contains('numOfColumns'):
-            max_col = settings.value('numOfColumns')
+            max_col = int(settings.value('numOfColumns'))
         else:
             max_col = 2 # default numOfColumns
         return max_col
@@ -430,24 +959,119 @@ class MaterialUI(QtWidgets.QDialog):
         settings = self.settings
         mat_path_text = ('Material ID File Path:' + 
                          settings.value('matListPath') + '\n\n')
+        shader_text = f'Shader Nodes: {self.shader_report}\n\n'
+        issues = self.library.issues
+        issue_text = ''
+        if issues:
+            issue_text = f'Skipped Lines ({len(issues)}):\n' + '\n'.join(
+                f'  line {line_no}: {text!r} ({reason})' 
+                for line_no, text, reason in issues[:20]) + '\n\n'
+        performance_text = ''
+        if instrumentation.enabled:
+            performance_text = 'Performance (seconds):\n' + '\n'.join(
+                f"  {phase['name']}: last {phase['last']:.3f}, "
+                f"mean {phase['mean']:.3f}, max {phase['max']:.3f} over "
+                f"{phase['runs']} runs, {phase['calls']} Maya calls, "
+                f"{phase['nodes']} nodes" 
+                for phase in instrumentation.summary()) + '\n\n'
         mat_list_text = 'Material List:\n' + str(self.mat_list)
-        msg.setText(mat_path_text + mat_list_text)
+        msg.setText(mat_path_text + shader_text + issue_text + 
+                    performance_text + mat_list_text)
         msg.show()
 
+    def toggle_performance(self, checked):
+        """Turns recording of phase timings and Maya calls on or off
+
+        Args:
+            checked: Records performance data if True
+        """
+        self.settings.setValue('recordPerformance', checked)
+        if checked:
+            instrumentation.enable([sys.modules[__name__]])
+        else:
+            instrumentation.disable()
+
+    def export_trace(self):
+        """Opens dialog box for user to save the recorded phases as a Chrome trace"""
+        if not instrumentation.history:
+            cmds.warning('No performance data recorded, enable Options > '
+                         'Record Performance Data first')
+            return
+        choose_file = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Export Performance Trace', 'materialId_trace.json',
+            filter="*.json")
+        trace_path = choose_file[0]
+        if trace_path:
+            instrumentation.export_chrome_trace(trace_path)
+
     # UI window methods
     def close_window_if_exists(self):
-        """Closes window if it already exists so user can only have one window open at a time"""
+        """Deletes windows left by an earlier import so user can only have one window at a time"""
         if QtWidgets.QApplication.instance():
-            for window in (QtWidgets.QApplication.allWindows()):
-                if 'MaterialIdUI' in window.objectName():
-                    window.close()
-
+            for widget in QtWidgets.QApplication.topLevelWidgets():
+                if widget is not self and widget.objectName() == 'MaterialIdUI':
+                    if hasattr(widget, 'dispose'):
+                        widget.dispose()
+                    else:
+                        widget.close()
+
+    def on_scene_changed(self, client_data=None):
+        """Marks the shaders for checking after a scene was opened or created"""
+        self.scene_changed = True
+
+    @instrumentation.timed('refresh')
+    def refresh(self):
+        """Brings a reopened window up to date with the material file and scene
+
+        Only what changed while the window was hidden is redone. A changed 
+        material file is diffed into the list the same way as a reload while 
+        the window is open and a new scene gets its missing shaders created.
+        """
+        mat_path = self.settings.value('matListPath')
+        if (mat_path != self.store.path or 
+                file_signature(mat_path) != self.store.signature):
+            self.sync_material_list(self.create_material_list())
+        if self.scene_changed:
+            self.scene_changed = False
+            self.create_shaders()
+
+    def showEvent(self, event):
+        """Tracks member changes while the window is shown
+
+        Changes made while the window was hidden were not tracked, so the 
+        member index is read again.
+        """
+        self.member_index.invalidate()
+        self.member_index.start_tracking()
+        super(MaterialUI, self).showEvent(event)
+
+    def hideEvent(self, event):
+        """Stops tracking member changes while the window is hidden"""
+        self.member_index.stop_tracking()
+        super(MaterialUI, self).hideEvent(event)
+
+    def dispose(self):
+        """Removes the callbacks of the window and deletes it"""
+        om.MMessage.removeCallbacks(self.scene_callback_ids)
+        self.scene_callback_ids = []
+        self.member_index.stop_tracking()
+        self.close()
+        self.deleteLater()
+
+    @instrumentation.timed('reflow')
+    def reflow_buttons(self):
+        """Sizes the view grid so the buttons wrap into the chosen number of columns"""
+        width = self.mat_view.viewport().width() // self.max_col
+        self.mat_view.setGridSize(QtCore.QSize(max(width, 60), 44))
+
+    @instrumentation.timed('create_ui')
     def create_ui(self, max_col):
         """Defines main UI layout for tool
 
         Args:
             max_col: An int that defines the number of button columns in the user interface
         """
+        self.max_col = max_col
         main_layout = QtWidgets.QVBoxLayout()
         
         # Menu bar
@@ -456,7 +1080,11 @@ class MaterialUI(QtWidgets.QDialog):
         mat_info = QtWidgets.QAction('Show Material Info',
                                              menu_bar)
         mat_info.triggered.connect(self.info_popup)
+        export_trace = QtWidgets.QAction('Export Performance Trace',
+                                         menu_bar)
+        export_trace.triggered.connect(self.export_trace)
         about_menu.addAction(mat_info)
+        about_menu.addAction(export_trace)
 
         options_menu = menu_bar.addMenu('Options')
         change_num_col = QtWidgets.QAction('Change Number of Columns',
@@ -464,9 +1092,49 @@ class MaterialUI(QtWidgets.QDialog):
         change_mat_path = QtWidgets.QAction('Change Material ID File Path',
                                     menu_bar)
         change_num_col.triggered.connect(self.get_column_input)
+        import_mats = QtWidgets.QAction('Import Material IDs From File',
+                                        menu_bar)
+        assign_rules = QtWidgets.QAction('Assign Materials From Rules File',
+                                         menu_bar)
         change_mat_path.triggered.connect(self.update_mat_file)
+        import_mats.triggered.connect(self.import_mats)
+        assign_rules.triggered.connect(self.assign_rules)
+        reconcile = QtWidgets.QAction('Reconcile Scene Shaders', menu_bar)
+        reconcile.triggered.connect(self.reconcile_scene)
+        prune_unused = QtWidgets.QAction('Prune Unused IDs From Usage Report', 
+                                         menu_bar)
+        prune_unused.triggered.connect(self.prune_unused)
+        bake_colors = QtWidgets.QAction('Bake Material IDs to Color Set', 
+                                        menu_bar)
+        bake_colors.triggered.connect(self.bake_colors)
+        export_table = QtWidgets.QAction('Export Material ID Table', menu_bar)
+        export_table.triggered.connect(self.export_table)
         options_menu.addAction(change_num_col)
         options_menu.addAction(change_mat_path)
+        options_menu.addAction(import_mats)
+        options_menu.addAction(assign_rules)
+        options_menu.addAction(reconcile)
+        options_menu.addAction(prune_unused)
+        options_menu.addAction(bake_colors)
+        options_menu.addAction(export_table)
+
+        record_performance = QtWidgets.QAction('Record Performance Data',
+                                               menu_bar)
+        record_performance.setCheckable(True)
+        record_performance.setChecked(instrumentation.enabled)
+        record_performance.toggled.connect(self.toggle_performance)
+        options_menu.addSeparator()
+        options_menu.addAction(record_performance)
+
+        snapshot_menu = menu_bar.addMenu('Snapshots')
+        take_snapshot = QtWidgets.QAction('Save Assignment Snapshot', 
+                                          menu_bar)
+        take_snapshot.triggered.connect(self.take_snapshot)
+        restore_snapshot = QtWidgets.QAction('Restore Assignment Snapshot', 
+                                             menu_bar)
+        restore_snapshot.triggered.connect(self.restore_snapshot)
+        snapshot_menu.addAction(take_snapshot)
+        snapshot_menu.addAction(restore_snapshot)
 
         # Independent tools
         func_hbox = QtWidgets.QHBoxLayout()
@@ -483,65 +1151,56 @@ class MaterialUI(QtWidgets.QDialog):
         func_hbox.addWidget(add_btn)
         func_hbox.addWidget(delete_btn)
 
-        # Shader scroll area and widgets
-        # The maya port requires a window with a layout
-        tempwin = cmds.window()
-        cmds.columnLayout()
-        
-        grid_layout = QtWidgets.QGridLayout()
-        scroll_area = QtWidgets.QScrollArea()
-        shader_widget = QtWidgets.QWidget()
-        row = 0
-        col = 0
-
-        # Create all shader buttons
-        for mat in self.mat_list:
-            if col == max_col:
-                col = 0
-                row += 1
-
-            swatch = cmds.swatchDisplayPort(rs=32, wh=(32, 32), sn=mat)
-
-            # Wrap port in a QtWidget 
-            port = omui.MQtUtil.findControl(swatch)
-            qport = wrapInstance(int(port), QtWidgets.QWidget)
-            widget = QtWidgets.QWidget()
-            qport.setParent(widget)
-
-            # Initialize button and label
-            shader_btn = ResizableButton()
-            shader_btn.installEventFilter(self)
-            shader_btn.setStatusTip('Left Click to Apply Material, ' 
-                                    'Right Click to Select Objects...')
-            shader_label = QtWidgets.QLabel(mat)
-
-            # Add horizontal layout and port to button
-            shader_hbox = QtWidgets.QHBoxLayout()
-            widget.setLayout(shader_hbox)
-            shader_btn.setLayout(shader_hbox)
-
-            shader_hbox.addWidget(qport, alignment=QtCore.Qt.AlignLeft)
-            shader_hbox.addWidget(shader_label, 
-                                  alignment=QtCore.Qt.AlignCenter)
-
-            grid_layout.addWidget(shader_btn, row, col)
-
-            col += 1
-
-        # Delete temp window after ports created
-        cmds.deleteUI(tempwin)
-
-        # Set shader area main layouts
-        shader_widget.setLayout(grid_layout)
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setWidget(shader_widget)
+        # Filter box, matches parts of names and tolerates typos
+        self.filter_box = QtWidgets.QLineEdit()
+        self.filter_box.setPlaceholderText('Filter Materials')
+        self.filter_box.setClearButtonEnabled(True)
+        self.filter_box.textChanged.connect(self.filter_buttons)
+
+        # Shader view, swatches are only drawn for rows in the viewport
+        self.mat_model = MaterialListModel(self.mat_list, self.shader_colors, 
+                                           self.member_index, self)
+        self.mat_view = QtWidgets.QListView()
+        self.mat_view.setModel(self.mat_model)
+        self.mat_view.setItemDelegate(MaterialButtonDelegate(self.mat_view))
+        self.mat_view.setFlow(QtWidgets.QListView.LeftToRight)
+        self.mat_view.setWrapping(True)
+        self.mat_view.setResizeMode(QtWidgets.QListView.Adjust)
+        self.mat_view.setUniformItemSizes(True)
+        self.mat_view.setLayoutMode(QtWidgets.QListView.Batched)
+        self.mat_view.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.mat_view.setMouseTracking(True)
+        self.mat_view.viewport().installEventFilter(self)
+        self.member_index.listeners.append(self.mat_view.viewport().update)
+        self.reflow_buttons()
         
         main_layout.addWidget(menu_bar)
         main_layout.addLayout(func_hbox)
-        main_layout.addWidget(scroll_area)
+        main_layout.addWidget(self.filter_box)
+        main_layout.addWidget(self.mat_view)
         self.setLayout(main_layout)
     
+_window = None
+
+def show():
+    """Shows the Material ID window, creating it on the first call
+
+    Later calls show the same window again and only refresh what changed 
+    since it was hidden.
+
+    Returns:
+        MaterialUI: The tool window
+    """
+    global _window
+    if _window is None:
+        _window = MaterialUI(main_window())
+    else:
+        _window.refresh()
+    _window.show()
+    _window.raise_()
+    _window.activateWindow()
+    return _window
+
 if __name__ == "__main__":
     """Main function which initializes shows Material Id UI"""
-    ui = MaterialUI()
-    ui.show()
+    show()
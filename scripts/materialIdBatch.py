@@ -0,0 +1,441 @@
+"""Headless Material ID batch processing for mayapy
+
+Creates the material ID shaders and applies assignment rules to many scene 
+files in parallel, or reports which material IDs the scenes use. Every 
+worker is a long running mayapy process that initializes Maya once and then 
+processes scenes one after another, so the Maya startup cost is paid once 
+per worker instead of once per scene.
+
+Example:
+    mayapy materialIdBatch.py --library ids.txt --rules rules.txt \\
+        --workers 4 --save shots/*.mb
+    mayapy materialIdBatch.py --library ids.txt --usage usage.csv \\
+        --usage-scenes usage_scenes.csv shots/*.mb
+"""
+import argparse
+import collections
+import csv
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+RESULT_PREFIX = 'MATERIALID_RESULT '
+
+# Worker side, runs inside mayapy
+def initialize_maya():
+    """Starts Maya in the current mayapy process"""
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+
+def process_scene(task, rules_cache):
+    """Opens a scene, creates the material ID shaders and applies assignment rules
+
+    Args:
+        task: A dict with the scene, library, rules, save and output_dir keys
+        rules_cache: A dict mapping rules file paths to compiled AssignmentRules
+
+    Returns:
+        A dict with the shader and assignment statistics of the scene
+    """
+    import maya.cmds as cmds
+    from materialIdCore import (AssignmentRules, assign_by_rules, 
+                                build_shaders, load_material_library)
+
+    cmds.file(task['scene'], open=True, force=True)
+    library = load_material_library(task['library'])
+    report = build_shaders(library.colors)
+    stats = {'created': report.created, 'reused': report.reused,
+             'skipped_lines': len(library.issues)}
+
+    rules_path = task.get('rules')
+    if rules_path:
+        if rules_path not in rules_cache:
+            rules_cache[rules_path] = AssignmentRules.from_file(rules_path)
+        assigned, missing = assign_by_rules(rules_cache[rules_path])
+        stats['assigned'] = sum(assigned.values())
+        stats['missing'] = missing
+
+    if task.get('output_dir'):
+        cmds.file(rename=os.path.join(task['output_dir'], 
+                                      os.path.basename(task['scene'])))
+    if task.get('save') or task.get('output_dir'):
+        cmds.file(save=True, force=True)
+    return stats
+
+def usage_scene(task, sent_libraries):
+    """Opens a scene and counts the meshes and faces of every material ID
+
+    Args:
+        task: A dict with the scene and library keys
+        sent_libraries: A set of library paths whose names this worker 
+            already returned
+
+    Returns:
+        A dict with the usage of the scene, and the library names the first 
+        time the worker reads a library
+    """
+    import maya.cmds as cmds
+    from materialIdCore import load_material_library, material_usage
+
+    cmds.file(task['scene'], open=True, force=True)
+    library = load_material_library(task['library'])
+    stats = {'usage': material_usage(library.names)}
+    if task['library'] not in sent_libraries:
+        sent_libraries.add(task['library'])
+        stats['names'] = library.names
+    return stats
+
+def run_worker(stdin=sys.stdin, stdout=sys.stdout):
+    """Processes scene tasks read as JSON lines until stdin is closed
+
+    Every result is written as one JSON line after a marker so Maya output 
+    on the same stream can be told apart.
+
+    Args:
+        stdin: The stream tasks are read from
+        stdout: The stream results are written to
+    """
+    initialize_maya()
+    rules_cache = {}
+    sent_libraries = set()
+    for line in stdin:
+        task = json.loads(line)
+        start = time.perf_counter()
+        result = {'scene': task['scene'], 'ok': True}
+        try:
+            if task.get('action') == 'usage':
+                result['stats'] = usage_scene(task, sent_libraries)
+            else:
+                result['stats'] = process_scene(task, rules_cache)
+        except Exception as error:
+            result['ok'] = False
+            result['error'] = f'{type(error).__name__}: {error}'
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        stdout.write(RESULT_PREFIX + json.dumps(result) + '\n')
+        stdout.flush()
+
+# Runner side, can run in mayapy or a plain python interpreter
+class WorkerProcess(object):
+    """A mayapy worker process that is fed one scene at a time"""
+    def __init__(self, mayapy, worker_mode='--worker'):
+        """Starts the worker process
+
+        Args:
+            mayapy: The path of the mayapy executable
+            worker_mode: The command line flag that selects the worker loop
+        """
+        self.command = [mayapy, os.path.abspath(__file__), worker_mode]
+        self.process = None
+        self.start()
+
+    def start(self):
+        """Starts or restarts the worker process"""
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, text=True,
+                                        bufsize=1)
+
+    def run(self, task):
+        """Sends a task to the worker and waits for its result
+
+        A worker that dies while processing a scene is restarted, and the 
+        scene is reported as failed.
+
+        Args:
+            task: A JSON serializable task dict
+
+        Returns:
+            The result dict of the task
+        """
+        start = time.perf_counter()
+        try:
+            self.process.stdin.write(json.dumps(task) + '\n')
+            self.process.stdin.flush()
+            for line in self.process.stdout:
+                if line.startswith(RESULT_PREFIX):
+                    return json.loads(line[len(RESULT_PREFIX):])
+        except OSError:
+            pass
+
+        code = self.process.wait()
+        self.start()
+        return {'scene': task['scene'], 'ok': False,
+                'error': f'worker exited with code {code}',
+                'seconds': round(time.perf_counter() - start, 3)}
+
+    def close(self):
+        """Closes the task stream so the worker exits and waits for it"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+def run_tasks(tasks, workers, mayapy, on_result=None, worker_mode='--worker'):
+    """Runs tasks on a pool of mayapy workers
+
+    Args:
+        tasks: A list of task dicts with a scene key
+        workers: Number of mayapy processes to run in parallel
+        mayapy: The path of the mayapy executable
+        on_result: Optional callable that gets every result as it finishes
+        worker_mode: The command line flag that selects the worker loop
+
+    Returns:
+        list[dict]: The results in task order
+    """
+    pending = queue.Queue()
+    for i, task in enumerate(tasks):
+        pending.put((i, task))
+    results = [None] * len(tasks)
+    lock = threading.Lock()
+
+    def feed_worker():
+        worker = WorkerProcess(mayapy, worker_mode)
+        try:
+            while True:
+                try:
+                    i, task = pending.get_nowait()
+                except queue.Empty:
+                    return
+                result = worker.run(task)
+                with lock:
+                    results[i] = result
+                    if on_result is not None:
+                        on_result(result)
+        finally:
+            worker.close()
+
+    threads = [threading.Thread(target=feed_worker) 
+               for _ in range(max(1, min(workers, len(tasks))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+class UsageReport(object):
+    """Aggregates material ID usage from scene results as they arrive
+
+    Memory is bounded by the size of the library, not the number of scenes: 
+    per scene usage is written to the optional scene report right away and 
+    then dropped from the result. Failed scenes are counted so the totals 
+    can be marked as incomplete.
+    """
+    def __init__(self, scenes_path=None):
+        """Initializes empty totals
+
+        Args:
+            scenes_path: Optional path of a per scene report, CSV if it ends 
+                in .csv and JSON lines otherwise
+        """
+        self.names = None
+        self.totals = collections.defaultdict(lambda: [0, 0, 0])
+        self.failed = 0
+        self.scene_file = None
+        self.scene_writer = None
+        if scenes_path:
+            self.scene_file = open(scenes_path, 'w', newline='')
+            if scenes_path.lower().endswith('.csv'):
+                self.scene_writer = csv.writer(self.scene_file)
+                self.scene_writer.writerow(['scene', 'material', 'meshes', 
+                                            'faces'])
+
+    def add(self, result):
+        """Adds the usage of one scene result and removes it from the result
+
+        Args:
+            result: A scene result dict
+        """
+        if not result['ok']:
+            self.failed += 1
+        stats = result.get('stats') or {}
+        names = stats.pop('names', None)
+        if names is not None and self.names is None:
+            self.names = names
+        usage = stats.pop('usage', None)
+        if usage is None:
+            return
+        stats['ids_used'] = len(usage)
+        for mat, (meshes, faces) in usage.items():
+            totals = self.totals[mat]
+            totals[0] += 1
+            totals[1] += meshes
+            totals[2] += faces
+
+        if self.scene_writer is not None:
+            self.scene_writer.writerows(
+                [result['scene'], mat, meshes, faces] 
+                for mat, (meshes, faces) in usage.items())
+        elif self.scene_file is not None:
+            self.scene_file.write(json.dumps({'scene': result['scene'], 
+                                              'usage': usage}) + '\n')
+
+    def write(self, path):
+        """Writes the totals of every material ID, including unused ones
+
+        Every row also holds the number of failed scenes, so readers can 
+        tell an incomplete report apart.
+
+        Args:
+            path: The report path, CSV if it ends in .csv and JSON lines 
+                otherwise
+        """
+        names = list(self.names or [])
+        seen = set(names)
+        names.extend(mat for mat in self.totals if mat not in seen)
+        with open(path, 'w', newline='') as report_file:
+            if path.lower().endswith('.csv'):
+                writer = csv.writer(report_file)
+                writer.writerow(['material', 'scenes', 'meshes', 'faces', 
+                                 'failed_scenes'])
+                writer.writerows([mat] + self.totals.get(mat, [0, 0, 0]) + 
+                                 [self.failed] for mat in names)
+            else:
+                for mat in names:
+                    scenes, meshes, faces = self.totals.get(mat, [0, 0, 0])
+                    report_file.write(json.dumps({
+                        'material': mat, 'scenes': scenes, 
+                        'meshes': meshes, 'faces': faces, 
+                        'failed_scenes': self.failed}) + '\n')
+
+    def unused(self):
+        """Gets the library material IDs that no scene used
+
+        Returns:
+            list[str]: The unused material names
+        """
+        return [mat for mat in self.names or [] if mat not in self.totals]
+
+    def close(self):
+        """Closes the per scene report"""
+        if self.scene_file is not None:
+            self.scene_file.close()
+
+def print_result(result):
+    """Prints one scene result line
+
+    Args:
+        result: A scene result dict
+    """
+    if result['ok']:
+        stats = ', '.join(f'{key} {value}' 
+                          for key, value in result['stats'].items()
+                          if not isinstance(value, (list, dict)))
+        print(f"OK    {result['seconds']:8.2f}s  {result['scene']}  ({stats})")
+    else:
+        print(f"FAIL  {result['seconds']:8.2f}s  {result['scene']}  "
+              f"{result['error']}")
+    sys.stdout.flush()
+
+def parse_args(argv):
+    """Parses the batch command line
+
+    Args:
+        argv: A list of command line arguments
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if shutil.which(args.mayapy) is None:
+        parser.error(f'mayapy executable not found: {args.mayapy}')
+    return args
+
+def build_parser():
+    """Defines the batch command line
+
+    Returns:
+        argparse.ArgumentParser: The argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description='Create material ID shaders and apply assignment rules to '
+                    'many Maya scenes in parallel, or report material ID '
+                    'usage.')
+    parser.add_argument('scenes', nargs='+', help='Maya scene files')
+    parser.add_argument('--library', required=True, 
+                        help='Material ID text file')
+    parser.add_argument('--rules', help='Assignment rules text file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of mayapy processes (default: CPU count)')
+    parser.add_argument('--mayapy', 
+                        default=os.environ.get('MAYAPY', 'mayapy'),
+                        help='mayapy executable (default: $MAYAPY or mayapy)')
+    parser.add_argument('--save', action='store_true',
+                        help='Save every scene in place')
+    parser.add_argument('--output-dir', 
+                        help='Save every scene into this folder instead')
+    parser.add_argument('--report', help='Write all results to a JSON file')
+    parser.add_argument('--usage', 
+                        help='Only count material ID usage and write the '
+                             'totals per ID to this .csv or .jsonl file')
+    parser.add_argument('--usage-scenes', 
+                        help='With --usage, also stream the usage of every '
+                             'scene to this .csv or .jsonl file')
+    return parser
+
+def main(argv=None):
+    """Runs the batch command line
+
+    Args:
+        argv: Optional list of command line arguments, defaults to sys.argv
+
+    Returns:
+        int: 0 if every scene was processed, 1 otherwise
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--worker']:
+        run_worker()
+        return 0
+
+    args = parse_args(argv)
+    if args.usage:
+        tasks = [{'scene': os.path.abspath(scene), 'action': 'usage',
+                  'library': os.path.abspath(args.library)}
+                 for scene in args.scenes]
+    else:
+        tasks = [{'scene': os.path.abspath(scene),
+                  'library': os.path.abspath(args.library),
+                  'rules': args.rules and os.path.abspath(args.rules),
+                  'save': args.save,
+                  'output_dir': (args.output_dir and 
+                                 os.path.abspath(args.output_dir))}
+                 for scene in args.scenes]
+
+    usage = UsageReport(args.usage_scenes) if args.usage else None
+
+    def on_result(result):
+        if usage is not None:
+            usage.add(result)
+        print_result(result)
+
+    start = time.perf_counter()
+    try:
+        results = run_tasks(tasks, args.workers, args.mayapy, on_result)
+    finally:
+        if usage is not None:
+            usage.close()
+    failed = [result for result in results if not result['ok']]
+    print(f'{len(results) - len(failed)} scenes processed, {len(failed)} '
+          f'failed in {time.perf_counter() - start:.2f}s')
+
+    if usage is not None:
+        usage.write(args.usage)
+        print(f'{len(usage.totals)} material IDs used, '
+              f'{len(usage.unused())} unused')
+        if failed:
+            print(f'Usage is incomplete because {len(failed)} scenes failed, '
+                  'the report is marked so it cannot be used for pruning')
+
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(results, report_file, indent=2)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2163 @@
+"""UI-free material ID logic shared by the Material ID tool and batch scripts
+
+Everything in this module only needs maya.cmds and the Maya API, so it can be
+used from mayapy without Qt or the Maya main window.
+"""
+import base64
+import collections
+import contextlib
+import csv
+import fnmatch
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import zlib
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds 
+import maya.mel as mel
+import numpy as np
+
+# Index helpers
+def index_runs(indices):
+    """Groups sorted integer indices into contiguous runs
+
+    Args:
+        indices: A sorted list of integers
+
+    Yields:
+        tuple[int, int]: The first and last index of each run
+    """
+    first = last = None
+    for index in indices:
+        if first is None:
+            first = last = index
+        elif index == last + 1:
+            last = index
+        else:
+            yield first, last
+            first = last = index
+    if first is not None:
+        yield first, last
+
+# Instrumentation
+class CallCounter(object):
+    """Module stand-in that counts calls made through it while instrumentation is on"""
+    def __init__(self, module, prefix, recorder):
+        """Initializes counter for a module
+
+        Args:
+            module: The module whose function calls are counted
+            prefix: The name used for the module in call counts
+            recorder: The Instrumentation that receives the counts
+        """
+        self._module = module
+        self._prefix = prefix
+        self._recorder = recorder
+        self._functions = {}
+
+    def __getattr__(self, name):
+        function = self._functions.get(name)
+        if function is None:
+            attr = getattr(self._module, name)
+            if not callable(attr):
+                return attr
+            key = f'{self._prefix}.{name}'
+
+            @functools.wraps(attr)
+            def function(*args, **kwargs):
+                self._recorder.count_call(key)
+                return attr(*args, **kwargs)
+            self._functions[name] = function
+        return function
+
+class Instrumentation(object):
+    """Opt-in timing of tool phases with Maya call and node counts
+
+    Every finished phase is kept in a rolling history with its duration, the
+    maya.cmds and maya.mel calls made and the number of nodes touched. While 
+    disabled, phases cost a single flag check.
+    """
+    def __init__(self, history_size=1000):
+        """Initializes disabled instrumentation
+
+        Args:
+            history_size: Number of finished phases kept in the history
+        """
+        self.enabled = False
+        self.history = collections.deque(maxlen=history_size)
+        self.stack = []
+        self.modules = []
+        self.origin = time.perf_counter()
+
+    def enable(self, modules=()):
+        """Starts recording and counts Maya calls made from the given modules
+
+        Args:
+            modules: Modules whose cmds and mel globals are counted, this 
+                module is always included
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        for module in (sys.modules[__name__],) + tuple(modules):
+            for name in ('cmds', 'mel'):
+                original = getattr(module, name, None)
+                if original is not None:
+                    self.modules.append((module, name, original))
+                    setattr(module, name, CallCounter(original, name, self))
+
+    def disable(self):
+        """Stops recording and restores the original Maya modules"""
+        for module, name, original in self.modules:
+            setattr(module, name, original)
+        self.modules = []
+        self.enabled = False
+
+    def count_call(self, key):
+        """Adds a Maya call to every open phase
+
+        Args:
+            key: The module and function name of the call
+        """
+        for frame in self.stack:
+            frame['calls'][key] += 1
+
+    def touch(self, count):
+        """Adds touched nodes to every open phase
+
+        Args:
+            count: Number of nodes created, edited or deleted
+        """
+        for frame in self.stack:
+            frame['nodes'] += count
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Records the time, Maya calls and nodes touched of a block
+
+        Args:
+            name: The phase name shown in reports
+        """
+        if not self.enabled:
+            yield
+            return
+        frame = {'name': name, 'calls': collections.Counter(), 'nodes': 0,
+                 'depth': len(self.stack), 'start': time.perf_counter()}
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            frame['seconds'] = time.perf_counter() - frame['start']
+            self.history.append(frame)
+
+    def timed(self, name):
+        """Decorates a function so every call is recorded as a phase
+
+        Args:
+            name: The phase name shown in reports
+
+        Returns:
+            The decorator
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """Aggregates the history per phase name
+
+        Returns:
+            list[dict]: Per phase name the number of runs, the last, mean and 
+            max seconds and the Maya calls and nodes touched of the last run
+        """
+        phases = collections.OrderedDict()
+        for frame in self.history:
+            phases.setdefault(frame['name'], []).append(frame)
+        summary = []
+        for name, frames in phases.items():
+            seconds = [frame['seconds'] for frame in frames]
+            summary.append({'name': name, 'runs': len(frames),
+                            'last': seconds[-1], 
+                            'mean': sum(seconds) / len(seconds),
+                            'max': max(seconds),
+                            'calls': sum(frames[-1]['calls'].values()),
+                            'nodes': frames[-1]['nodes']})
+        return summary
+
+    def export_chrome_trace(self, path):
+        """Writes the history as Chrome trace JSON for chrome://tracing or Perfetto
+
+        Args:
+            path: The path of the trace file
+        """
+        events = [{'name': frame['name'], 'ph': 'X', 'pid': 1, 'tid': 1,
+                   'ts': round((frame['start'] - self.origin) * 1e6),
+                   'dur': round(frame['seconds'] * 1e6),
+                   'args': {'nodes': frame['nodes'], 
+                            'calls': dict(frame['calls'])}}
+                  for frame in self.history]
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 
+                       'displayTimeUnit': 'ms'}, trace_file)
+
+instrumentation = Instrumentation()
+if os.environ.get('MATERIAL_ID_PROFILE'):
+    instrumentation.enable()
+
+# Undo and viewport batching
+# Set MATERIAL_ID_NO_SUSPEND=1 to measure bulk operations with live redraws
+SUSPEND_REFRESH = not os.environ.get('MATERIAL_ID_NO_SUSPEND')
+
+@contextlib.contextmanager
+def maya_batch(name):
+    """Runs a bulk scene change as one named undo step with redraws suspended
+
+    The viewport refresh is restored and the undo chunk closed even if the 
+    block raises. Nested batches join the outermost one. The block is 
+    recorded as an instrumentation phase whose name says whether refresh 
+    was suspended, so timings with and without suspension can be compared.
+
+    Args:
+        name: The undo chunk name, shown in the Edit menu as the undo step
+    """
+    suspend = SUSPEND_REFRESH and not cmds.refresh(query=True, suspend=True)
+    phase = f'{name} (refresh suspended)' if suspend else name
+    with instrumentation.phase(phase):
+        cmds.undoInfo(openChunk=True, chunkName=name)
+        if suspend:
+            cmds.refresh(suspend=True)
+        try:
+            yield
+        finally:
+            if suspend:
+                cmds.refresh(suspend=False)
+            cmds.undoInfo(closeChunk=True)
+
+# Material library loading
+MAYA_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+LIBRARY_CACHE_VERSION = 1
+
+class MaterialLibrary(object):
+    """Validated list of material names loaded from a material ID file"""
+    def __init__(self, path, names, colors=None, issues=None):
+        """Initializes library and builds the name index
+
+        Args:
+            path: The path of the material ID text file
+            names: A list of unique, valid material names in file order
+            colors: A dict mapping material names to a RGB color value
+            issues: A list of (line number, text, reason) tuples for skipped lines
+        """
+        self.path = path
+        self.names = names
+        self.index = {name: row for row, name in enumerate(names)}
+        self.colors = colors if colors is not None else {}
+        self.issues = issues if issues is not None else []
+
+def is_valid_material_name(name):
+    """Checks if a name can be used as a Maya node name
+
+    Args:
+        name: The material name to check
+
+    Returns:
+        bool: True if the name only uses letters, digits and underscores and 
+        does not start with a digit
+    """
+    return bool(MAYA_NAME_PATTERN.match(name))
+
+def parse_material_lines(lines):
+    """Validates the lines of a material ID file
+
+    Blank lines, duplicate names and names that are not legal Maya node 
+    names are skipped and reported instead of breaking shader creation.
+
+    Args:
+        lines: An iterable of lines, with or without line endings
+
+    Returns:
+        tuple[list[str], list[tuple[int, str, str]]]: The valid material names
+        in file order and the issues found in skipped lines
+    """
+    names = []
+    seen = set()
+    issues = []
+    for line_no, line in enumerate(lines, 1):
+        name = line.strip()
+        if not name:
+            issues.append((line_no, line.rstrip('\r\n'), 'blank line'))
+        elif name in seen:
+            issues.append((line_no, name, 'duplicate name'))
+        elif not is_valid_material_name(name):
+            issues.append((line_no, name, 'illegal Maya node name'))
+        else:
+            seen.add(name)
+            names.append(name)
+    return names, issues
+
+def parse_material_file(mat_path):
+    """Streams a material ID file and validates every line
+
+    Args:
+        mat_path: The path of the material ID text file
+
+    Returns:
+        tuple[list[str], list[tuple[int, str, str]]]: The valid material names
+        in file order and the issues found in skipped lines
+    """
+    with open(mat_path, 'r') as mat_file:
+        return parse_material_lines(mat_file)
+
+def library_cache_dir():
+    """Gets the folder that holds compiled material library caches
+
+    Returns:
+        string: The MATERIAL_ID_CACHE environment variable or a folder in the
+        user home directory
+    """
+    return os.environ.get('MATERIAL_ID_CACHE', 
+                          os.path.join(os.path.expanduser('~'), '.materialId',
+                                       'cache'))
+
+def file_signature(path):
+    """Gets size and modification time of a file to detect changes
+
+    Args:
+        path: The path of the file
+
+    Returns:
+        list[int]: Size in bytes and modification time in nanoseconds, or an 
+        empty list if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return []
+    return [stat.st_size, stat.st_mtime_ns]
+
+@contextlib.contextmanager
+def file_lock(path, timeout=10.0):
+    """Holds a lock file next to a shared file while it is read and rewritten
+
+    A lock older than the timeout is taken to be left behind by a crashed 
+    session and is taken over. Without write access to the folder no lock 
+    can be created and the block runs unlocked, its write fails anyway.
+
+    Args:
+        path: The path of the shared file
+        timeout: Seconds to wait for another session to release the lock
+    """
+    lock_path = path + '.lock'
+    deadline = time.monotonic() + timeout
+    fd = None
+    while fd is None:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.stat(lock_path).st_mtime > timeout
+            except OSError:
+                continue
+            if stale or time.monotonic() > deadline:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+            else:
+                time.sleep(0.05)
+        except OSError:
+            break
+    try:
+        yield
+    finally:
+        if fd is not None:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+def load_material_library(mat_path):
+    """Loads a material ID file, reusing the compiled cache if the file is unchanged
+
+    The cache is keyed by the absolute file path and stores the file and 
+    color file signatures, so a library on slow network storage is only 
+    parsed again after it or its colors were edited.
+
+    Args:
+        mat_path: The path of the material ID text file
+
+    Returns:
+        MaterialLibrary: The validated library
+    """
+    abs_path = os.path.abspath(mat_path)
+    cache_path = os.path.join(library_cache_dir(), hashlib.sha1(
+        abs_path.encode('utf-8')).hexdigest() + '.json')
+    palette_path = mat_path + '.colors.json'
+    key = {'version': LIBRARY_CACHE_VERSION,
+           'path': abs_path,
+           'file': file_signature(mat_path),
+           'colors': file_signature(palette_path)}
+
+    try:
+        with open(cache_path, 'r') as cache_file:
+            cache = json.load(cache_file)
+        if cache['key'] == key:
+            colors = {name: tuple(color) 
+                      for name, color in zip(cache['names'], cache['colors'])}
+            issues = [tuple(issue) for issue in cache['issues']]
+            return MaterialLibrary(mat_path, cache['names'], colors, issues)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    names, issues = parse_material_file(mat_path)
+    colors = PaletteStore(mat_path).assign(names)
+    key['colors'] = file_signature(palette_path)
+
+    # Write to a temporary file first so readers never see a partial cache
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + f'.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as cache_file:
+            cache_file.write(json.dumps({
+                'key': key, 'names': names, 'issues': issues,
+                'colors': [colors[name] for name in names]}))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+    return MaterialLibrary(mat_path, names, colors, issues)
+
+# Material store
+def split_material_names(text):
+    """Splits user input into material names
+
+    Maya node names cannot contain spaces or commas, so both separate names.
+
+    Args:
+        text: The string entered by the user
+
+    Returns:
+        list[str]: The material names in input order without duplicates
+    """
+    names = re.split(r'[\s,]+', text.strip())
+    return [name for name in dict.fromkeys(names) if name]
+
+class MaterialStore(object):
+    """In-memory index of a material ID file with batched, atomic writes
+
+    Adds and deletes only touch the in-memory list and set index. The file is
+    written once when the outermost transaction ends, through a temporary 
+    file that replaces the original so readers never see a partial file. The
+    file is read again and only the lines of the changed names are removed 
+    or appended, so lines the loader skipped and edits made by someone else 
+    since the file was read are kept.
+    """
+    def __init__(self, path, names):
+        """Initializes store with the current contents of a material ID file
+
+        Args:
+            path: The path of the material ID text file
+            names: The valid material names read from the file
+        """
+        self.path = path
+        self.names = list(names)
+        self.index = set(self.names)
+        self.signature = file_signature(path)
+        self.depth = 0
+        self.ops = []
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.names)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Groups adds and deletes so the file is written once
+
+        Changes are rolled back if the block raises an exception or the file 
+        cannot be written.
+
+        Yields:
+            MaterialStore: The store itself
+        """
+        names = list(self.names)
+        ops = len(self.ops)
+        self.depth += 1
+        try:
+            yield self
+            if self.depth == 1 and self.ops:
+                self.commit()
+        except BaseException:
+            self.names = names
+            self.index = set(names)
+            del self.ops[ops:]
+            raise
+        finally:
+            self.depth -= 1
+
+    def add_many(self, names):
+        """Adds valid names that are not in the store yet
+
+        Args:
+            names: A list of material names
+
+        Returns:
+            list[str]: The names that were added
+        """
+        added = [name for name in dict.fromkeys(names) 
+                 if name not in self.index and is_valid_material_name(name)]
+        if added:
+            with self.transaction():
+                self.names.extend(added)
+                self.index.update(added)
+                self.ops.append(('add', added))
+        return added
+
+    def delete_many(self, names):
+        """Deletes names that are in the store
+
+        Args:
+            names: A list of material names
+
+        Returns:
+            list[str]: The names that were deleted
+        """
+        deleted = [name for name in dict.fromkeys(names) if name in self.index]
+        if deleted:
+            with self.transaction():
+                removed = set(deleted)
+                self.names = [name for name in self.names 
+                              if name not in removed]
+                self.index -= removed
+                self.ops.append(('delete', deleted))
+        return deleted
+
+    def commit(self):
+        """Applies the pending changes to the file lines in one atomic replace
+
+        The pending changes are only cleared once the file was replaced. The
+        new file gets the permissions of the file it replaces.
+
+        Raises:
+            OSError: An error occurs if the file cannot be written
+        """
+        try:
+            with open(self.path, 'r') as mat_file:
+                lines = mat_file.read().splitlines()
+        except OSError:
+            lines = []
+        for op, op_names in self.ops:
+            if op == 'add':
+                existing = {line.strip() for line in lines}
+                lines.extend(name for name in op_names 
+                             if name not in existing)
+            else:
+                removed = set(op_names)
+                lines = [line for line in lines 
+                         if line.strip() not in removed]
+
+        temp_path = self.path + f'.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w') as mat_file:
+                mat_file.write('\n'.join(lines))
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.ops = []
+        self.signature = file_signature(self.path)
+        self.names, _ = parse_material_lines(lines)
+        self.index = set(self.names)
+
+# Material search
+FUZZY_MATCH_RATIO = 0.5
+
+def name_trigrams(text):
+    """Gets the distinct three letter sequences of a lowercase string
+
+    Args:
+        text: A lowercase string
+
+    Returns:
+        set[str]: The trigrams, empty for strings shorter than three letters
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class MaterialSearchIndex(object):
+    """Trigram index over material names for substring and fuzzy search
+
+    Every trigram maps to the sorted positions of the names containing it, 
+    so a query only counts the postings of its own trigrams instead of 
+    comparing against every name. Removed names leave an empty position 
+    behind until more than half of the positions are empty, so edits to 
+    the list only touch the postings of the changed names.
+    """
+    def __init__(self, names):
+        """Indexes a list of material names
+
+        Args:
+            names: A list of material names
+        """
+        self.build(names)
+
+    def build(self, names):
+        """Indexes a list of material names from scratch
+
+        Args:
+            names: A list of material names
+        """
+        self.names = list(names)
+        self.lower = [name.lower() for name in self.names]
+        self.empty = 0
+        postings = collections.defaultdict(list)
+        for position, name in enumerate(self.lower):
+            for trigram in name_trigrams(name):
+                postings[trigram].append(position)
+        self.postings = {trigram: np.array(positions, dtype=np.int32) 
+                         for trigram, positions in postings.items()}
+
+    def sync(self, names):
+        """Updates the index to a new list of material names
+
+        Removed names are dropped from their postings and added names are 
+        appended. The index is only rebuilt if the new list changes the order 
+        of the names it keeps or adds names anywhere but at the end.
+
+        Args:
+            names: The new list of material names
+        """
+        wanted = set(names)
+        removed = collections.defaultdict(list)
+        for position, name in enumerate(self.names):
+            if name is not None and name not in wanted:
+                for trigram in name_trigrams(self.lower[position]):
+                    removed[trigram].append(position)
+                self.names[position] = self.lower[position] = None
+                self.empty += 1
+        kept = [name for name in self.names if name is not None]
+        if (names[:len(kept)] != kept or 
+                self.empty * 2 > len(self.names) + len(names) - len(kept)):
+            self.build(names)
+            return
+
+        for trigram, positions in removed.items():
+            postings = self.postings[trigram]
+            postings = postings[~np.isin(postings, positions)]
+            if len(postings):
+                self.postings[trigram] = postings
+            else:
+                del self.postings[trigram]
+        added = collections.defaultdict(list)
+        for name in names[len(kept):]:
+            for trigram in name_trigrams(name.lower()):
+                added[trigram].append(len(self.names))
+            self.names.append(name)
+            self.lower.append(name.lower())
+        for trigram, positions in added.items():
+            positions = np.array(positions, dtype=np.int32)
+            if trigram in self.postings:
+                positions = np.concatenate([self.postings[trigram], 
+                                            positions])
+            self.postings[trigram] = positions
+
+    def search(self, text, fuzzy=True):
+        """Finds the names that contain a string, or names similar to it
+
+        Matching ignores case and names keep their list order. If no name 
+        contains the text and fuzzy is True, names sharing at least 
+        FUZZY_MATCH_RATIO of the trigrams of the text are returned instead, 
+        most similar first, so typos still find the material.
+
+        Args:
+            text: The search text
+            fuzzy: Falls back to names similar to the text if True
+
+        Returns:
+            list[str]: The matching names
+        """
+        text = text.strip().lower()
+        if not text:
+            return [name for name in self.names if name is not None]
+        trigrams = name_trigrams(text)
+        if not trigrams:
+            return [self.names[i] for i, name in enumerate(self.lower) 
+                    if name is not None and text in name]
+
+        postings = [self.postings[trigram] for trigram in trigrams 
+                    if trigram in self.postings]
+        scores = np.zeros(len(self.names), dtype=np.int32)
+        for positions in postings:
+            scores[positions] += 1
+
+        # Containing every trigram is necessary, not sufficient, for a match
+        candidates = np.flatnonzero(scores == len(trigrams)).tolist()
+        if len(text) > 3:
+            candidates = [i for i in candidates if text in self.lower[i]]
+        if candidates or not fuzzy:
+            return [self.names[i] for i in candidates]
+
+        minimum = max(1, int(np.ceil(FUZZY_MATCH_RATIO * len(trigrams))))
+        similar = np.flatnonzero(scores >= minimum)
+        similar = similar[np.argsort(-scores[similar], kind='stable')]
+        return [self.names[i] for i in similar.tolist()]
+
+# Color palette
+# Linear sRGB to XYZ relative to the D65 white point
+SRGB_TO_XYZ = np.array([[0.4124564, 0.2126729, 0.0193339],
+                        [0.3575761, 0.7151522, 0.1191920],
+                        [0.1804375, 0.0721750, 0.9503041]])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+def srgb_to_lab(rgb):
+    """Converts sRGB colors to CIELAB
+
+    Args:
+        rgb: An array of shape (N, 3) with sRGB values between 0 and 1
+
+    Returns:
+        numpy.ndarray: An array of shape (N, 3) with L*, a* and b* values
+    """
+    rgb = np.asarray(rgb, dtype=np.float64)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, 
+                      ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ SRGB_TO_XYZ / D65_WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), 
+                 xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16,
+                     500 * (f[:, 0] - f[:, 1]),
+                     200 * (f[:, 1] - f[:, 2])], axis=1)
+
+def lab_to_srgb(lab):
+    """Converts CIELAB colors to sRGB
+
+    Args:
+        lab: An array of shape (N, 3) with L*, a* and b* values
+
+    Returns:
+        numpy.ndarray: An array of shape (N, 3) with sRGB values, values 
+        outside of 0 to 1 are out of the sRGB gamut
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[:, 0] + 16) / 116
+    f = np.stack([fy + lab[:, 1] / 500, fy, fy - lab[:, 2] / 200], axis=1)
+    xyz = np.where(f > 6 / 29, f ** 3, 3 * (6 / 29) ** 2 * (f - 4 / 29))
+    linear = (xyz * D65_WHITE) @ np.linalg.inv(SRGB_TO_XYZ)
+    return np.where(linear <= 0.0031308, 12.92 * linear, 
+                    1.055 * np.abs(linear) ** (1 / 2.4) - 0.055)
+
+def lattice_colors(count, lightness=(25, 90)):
+    """Gets the sRGB colors of a cubic lattice in CIELAB with at least count points
+
+    Any two lattice points are at least one lattice spacing apart. The 
+    spacing starts from an estimate of the sRGB gamut volume and shrinks 
+    until enough lattice points fall inside the gamut, which keeps the cost 
+    linear in the color count.
+
+    Args:
+        count: Minimum number of colors
+        lightness: Range of L* values allowed, avoids near black and white
+
+    Returns:
+        tuple[numpy.ndarray, float]: An array of shape (N, 3) with RGB values
+        and the lattice spacing
+    """
+    low = np.array([lightness[0], -128, -128])
+    high = np.array([lightness[1], 128, 128])
+    samples = np.random.default_rng(80).random((20000, 3))
+    samples = lab_to_srgb(low + samples * (high - low))
+    in_gamut = ((samples >= 0) & (samples <= 1)).all(axis=1).mean()
+    spacing = (np.prod(high - low) * in_gamut / count) ** (1 / 3)
+
+    while True:
+        axes = [np.arange(low[i], high[i] + 1e-9, spacing) for i in range(3)]
+        lab = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+        rgb = lab_to_srgb(lab.reshape(-1, 3))
+        rgb = rgb[((rgb >= 0) & (rgb <= 1)).all(axis=1)]
+        if len(rgb) >= count:
+            return rgb, float(spacing)
+        spacing *= 0.95
+
+def generate_palette(count, existing=(), lightness=(25, 90)):
+    """Picks colors that are as far apart as possible in CIELAB
+
+    Colors are picked with farthest point sampling from a pool of CIELAB 
+    lattice colors, so each new color is the candidate farthest from every 
+    color picked or passed in before it. The distance of each pick never 
+    grows, which means every new color is at least the returned distance 
+    away from every other color. Sampling costs count times the pool size, 
+    so a fresh palette too large for it takes evenly spaced lattice colors 
+    instead, which are at least one lattice spacing apart.
+
+    Args:
+        count: Number of new colors to pick
+        existing: RGB colors already in use that new colors must avoid
+        lightness: Range of L* values allowed, avoids near black and white
+
+    Returns:
+        tuple[numpy.ndarray, float]: An array of shape (count, 3) with RGB
+        values and the minimum CIELAB distance to any other color
+    """
+    if count <= 0:
+        return np.zeros((0, 3)), float('inf')
+
+    # Every candidate is compared to every color in use, so a smaller pool 
+    # keeps adding a few colors to a large palette fast
+    pool = max(1024, 4 * count) if len(existing) else max(4096, 2 * count)
+    candidates, spacing = lattice_colors(pool, lightness)
+    if count * len(candidates) > 5e7 and not len(existing):
+        picks = np.linspace(0, len(candidates) - 1, count)
+        return candidates[picks.round().astype(np.int64)], spacing
+
+    lab = srgb_to_lab(candidates).astype(np.float32)
+    l_ch, a_ch, b_ch = lab[:, 0].copy(), lab[:, 1].copy(), lab[:, 2].copy()
+
+    # Squared distance from each candidate to the closest color in use
+    nearest = np.full(len(lab), np.inf, dtype=np.float32)
+    existing_lab = srgb_to_lab(np.reshape(existing, (-1, 3))).astype(np.float32)
+    lab_sq = (lab ** 2).sum(axis=1)
+    chunk = max(1, 2 ** 22 // len(lab))
+    for start in range(0, len(existing_lab), chunk):
+        block = existing_lab[start:start + chunk]
+        dist = lab @ (-2 * block.T)
+        dist += (block ** 2).sum(axis=1)
+        dist += lab_sq[:, None]
+        np.minimum(nearest, np.maximum(dist.min(axis=1), 0), out=nearest)
+
+    picks = np.empty(count, dtype=np.int64)
+    min_dist = np.inf
+    for i in range(count):
+        pick = int(np.argmax(nearest))
+        min_dist = min(min_dist, float(nearest[pick]))
+        picks[i] = pick
+        dist = (l_ch - l_ch[pick]) ** 2
+        dist += (a_ch - a_ch[pick]) ** 2
+        dist += (b_ch - b_ch[pick]) ** 2
+        np.minimum(nearest, dist, out=nearest)
+
+    return candidates[picks], float(np.sqrt(min_dist))
+
+class PaletteStore(object):
+    """Persisted assignment of material names to palette colors
+
+    The assignment is saved next to the material ID file so every artist 
+    sharing the file gets the same colors, and existing materials keep their
+    color when the list changes. Colors of deleted materials stay reserved so
+    a material that is added back gets its old color again. New colors are 
+    picked under a lock file against the colors saved by other sessions.
+    """
+    def __init__(self, mat_path):
+        """Initializes store and loads the saved assignment of a material file
+
+        Args:
+            mat_path: The path of the material ID text file
+        """
+        self.mat_path = mat_path
+        self.path = mat_path + '.colors.json'
+        self.colors = self.load()
+        self.min_distance = None
+
+    def load(self):
+        """Reads the saved assignment
+
+        Returns:
+            A dict mapping material names to a RGB color value, empty if no 
+            assignment was saved yet
+        """
+        try:
+            with open(self.path, 'r') as color_file:
+                saved = json.load(color_file)
+        except (OSError, ValueError):
+            return {}
+        return {mat: tuple(color) for mat, color in saved.items()}
+
+    def save(self):
+        """Writes the assignment atomically, skipped if the file is not writable
+
+        Other sessions and batch workers read the file at any time, so it is
+        written to a temporary file first and never seen half written.
+        """
+        temp_path = self.path + f'.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w') as color_file:
+                color_file.write(json.dumps(self.colors))
+            os.replace(temp_path, self.path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def assign(self, mat_list):
+        """Gets the color of every material, picking colors only for new materials
+
+        Args:
+            mat_list: A list of material names
+
+        Returns:
+            A dict mapping material names to a RGB color value
+        """
+        colors = self.colors
+        if any(mat not in colors for mat in mat_list):
+            with file_lock(self.path):
+                # Other sessions may have saved colors since the file was read
+                colors.update(self.load())
+                missing = [mat for mat in dict.fromkeys(mat_list) 
+                           if mat not in colors]
+                if missing:
+                    new_colors, self.min_distance = generate_palette(
+                        len(missing), list(colors.values()))
+                    new_colors = [tuple(round(c, 4) for c in color) 
+                                  for color in new_colors.tolist()]
+                    colors.update(zip(missing, new_colors))
+                    self.save()
+        return {mat: colors[mat] for mat in mat_list}
+
+# Bulk shader creation
+class ShaderBuildReport(object):
+    """Summary of a bulk shader creation pass"""
+    def __init__(self, created=0, reused=0):
+        """Initializes report counters
+
+        Args:
+            created: Number of lambert and shading group nodes created
+            reused: Number of lambert and shading group nodes that already existed
+        """
+        self.created = created
+        self.reused = reused
+
+    def __str__(self):
+        return f'{self.created} nodes created, {self.reused} nodes reused'
+
+    def add(self, report):
+        """Adds the counts of a later pass over part of the library
+
+        Args:
+            report: The ShaderBuildReport of the later pass
+        """
+        self.created += report.created
+        self.reused += report.reused
+
+def mel_string(text):
+    """Quotes a python string as a MEL string literal
+
+    Args:
+        text: The string to quote
+
+    Returns:
+        string: A double quoted MEL string with escaped characters
+    """
+    escaped = text.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def index_shading_nodes():
+    """Indexes existing lambert and shading group nodes with one scene query
+
+    Returns:
+        tuple[set[str], set[str]]: A set of lambert node names and a set of 
+        shading group node names
+    """
+    nodes = cmds.ls(exactType=['lambert', 'shadingEngine'], showType=True) or []
+    lamberts = set()
+    sgs = set()
+    for name, node_type in zip(nodes[::2], nodes[1::2]):
+        if node_type == 'lambert':
+            lamberts.add(name)
+        else:
+            sgs.add(name)
+    return lamberts, sgs
+
+def index_surface_shaders(sgs):
+    """Gets the shader connected to each shading group with one scene query
+
+    Args:
+        sgs: A list of existing shading group names
+
+    Returns:
+        dict[str, str]: Shading group names mapped to their surface shader
+    """
+    if not sgs:
+        return {}
+    plugs = cmds.listConnections([sg + '.surfaceShader' for sg in sgs], 
+                                 source=True, destination=False, 
+                                 connections=True) or []
+    return {plug.partition('.')[0]: shader 
+            for plug, shader in zip(plugs[::2], plugs[1::2])}
+
+def shader_commands(name, color, has_lambert, has_sg, connect=False):
+    """Gets the MEL commands that complete the lambert and shading group of a material
+
+    Args:
+        name: The material name
+        color: The RGB color value to set, or None to keep the current color
+        has_lambert: The lambert node already exists if True
+        has_sg: The shading group node already exists if True
+        connect: Connects the lambert to an existing shading group if True
+
+    Returns:
+        list[str]: The MEL commands in their own block scope
+    """
+    sg_name = name + 'SG'
+    commands = ['{']
+    if has_lambert:
+        commands.append(f'string $mat = {mel_string(name)};')
+    else:
+        commands.append('string $mat = `shadingNode -asShader -skipSelect '
+                        f'-name {mel_string(name)} lambert`;')
+
+    if not has_sg:
+        commands.append('string $sg = `sets -renderable true -noSurfaceShader '
+                        f'true -empty -name {mel_string(sg_name)}`;')
+        commands.append('connectAttr -f ($mat + ".outColor") '
+                        '($sg + ".surfaceShader");')
+    elif connect:
+        commands.append('connectAttr -f ($mat + ".outColor") '
+                        f'{mel_string(sg_name + ".surfaceShader")};')
+
+    if color is not None:
+        commands.append('setAttr ($mat + ".color") -type double3 '
+                        '{} {} {};'.format(*color))
+    commands.append('}')
+    return commands
+
+def build_shaders(shader_dict):
+    """Creates missing lambert and shading group nodes in one batched operation
+
+    Existing nodes are looked up by exact name in an index built from a single
+    scene query. Creation, connection and color updates for every material are 
+    collected into one MEL script so Maya is only called once for the whole
+    library, and the batch stays undoable unlike a free-standing API modifier.
+
+    Args:
+        shader_dict: A dict mapping material names to a RGB color value
+
+    Returns:
+        ShaderBuildReport: Counts of created and reused nodes
+    """
+    lamberts, sgs = index_shading_nodes()
+    report = ShaderBuildReport()
+    batch = []
+
+    for name, color in shader_dict.items():
+        if not name:
+            continue
+        has_lambert = name in lamberts
+        has_sg = name + 'SG' in sgs
+        report.created += (not has_lambert) + (not has_sg)
+        report.reused += has_lambert + has_sg
+        batch.extend(shader_commands(name, color, has_lambert, has_sg, 
+                                     connect=not has_lambert))
+
+    if batch:
+        with maya_batch('Create Material ID Shaders'):
+            mel.eval('\n'.join(batch))
+    instrumentation.touch(report.created + report.reused)
+    return report
+
+def delete_shaders(names):
+    """Deletes the lambert and shading group nodes of the given materials
+
+    Only lambert and shading group nodes with the exact names are deleted, 
+    and a shading group only if no other shader is connected to it.
+
+    Args:
+        names: A list of material names whose nodes should be removed
+    """
+    nodes = list(names) + [name + 'SG' for name in names]
+    existing = cmds.ls(nodes, exactType=['lambert', 'shadingEngine'], 
+                       showType=True) or []
+    sgs = [name for name, node_type in zip(existing[::2], existing[1::2]) 
+           if node_type == 'shadingEngine']
+    shaders = index_surface_shaders(sgs)
+    doomed = [name for name, node_type in zip(existing[::2], existing[1::2]) 
+              if node_type == 'lambert' or 
+              shaders.get(name, name[:-2]) == name[:-2]]
+    if doomed:
+        with maya_batch('Delete Material ID Shaders'):
+            cmds.delete(doomed)
+    instrumentation.touch(len(doomed))
+
+# Scene reconciliation
+# Maya default nodes that are never merged or deleted
+DEFAULT_SHADING_NODES = frozenset(['lambert1', 'initialShadingGroup', 
+                                   'initialParticleSE'])
+
+class ShaderReconcileReport(object):
+    """Operations of a scene reconciliation pass, planned or applied"""
+    def __init__(self):
+        """Initializes empty operation lists"""
+        self.created = []
+        self.connected = []
+        self.merged = []
+        self.deleted = []
+        self.in_use = []
+        self.flagged = []
+
+    def __bool__(self):
+        return bool(self.created or self.connected or self.merged or 
+                    self.deleted)
+
+    def __str__(self):
+        return (f'{len(self.created)} nodes created, {len(self.connected)} '
+                f'connections fixed, {len(self.merged)} duplicates merged, '
+                f'{len(self.deleted)} nodes deleted, {len(self.in_use)} '
+                f'retired nodes kept because they are in use, '
+                f'{len(self.flagged)} possible duplicates left for review')
+
+    def lines(self, limit=None):
+        """Lists every operation on its own line
+
+        Args:
+            limit: Optional maximum number of lines
+
+        Returns:
+            list[str]: One description per operation
+        """
+        lines = [f'create {node}' for node in self.created]
+        lines += [f'connect {shader} to {sg}' 
+                  for shader, sg in self.connected]
+        lines += [f'merge {duplicate} into {node}' 
+                  for duplicate, node in self.merged]
+        lines += [f'delete {node}' for node in self.deleted]
+        lines += [f'keep {node}, it still has members' 
+                  for node in self.in_use]
+        lines += [f'review {node}, it looks like a duplicate of {name} but '
+                  'still has members' for node, name in self.flagged]
+        return lines[:limit]
+
+def duplicate_of(node, names, suffix='', known=()):
+    """Gets the material a node name was derived from by a name clash
+
+    Maya appends a number when a node name is taken, so 'Material3' created 
+    while 'Material' existed, or 'MaterialSG1' for its shading group. The 
+    node only counts as a duplicate when the name without the number is a 
+    material name and the node name itself is not a known material.
+
+    Args:
+        node: The node name
+        names: A set of material names
+        suffix: The suffix of the node type, 'SG' for shading groups
+        known: Further material names that are never duplicates, like 
+            retired materials
+
+    Returns:
+        string: The material name the node derives from, or None
+    """
+    stem = node.rstrip('0123456789')
+    if stem == node or not stem.endswith(suffix):
+        return None
+    name = stem[:len(stem) - len(suffix)]
+    if name not in names:
+        return None
+    own = node[:len(node) - len(suffix)] if node.endswith(suffix) else node
+    if own in names or own in known:
+        return None
+    return name
+
+def used_shading_groups(sgs):
+    """Finds the shading groups that have members
+
+    Args:
+        sgs: Shading group names
+
+    Returns:
+        set: The shading groups with objects or faces assigned
+    """
+    if not sgs:
+        return set()
+    plugs = cmds.listConnections([sg + '.dagSetMembers' for sg in sgs], 
+                                 source=True, destination=False, 
+                                 connections=True) or []
+    return {plug.partition('.')[0] for plug in plugs[::2]}
+
+def reconcile_shaders(shader_dict, retired=(), dry_run=False):
+    """Brings the lambert and shading group nodes of a scene in line with the library
+
+    Every lambert and shading group and the surface shader connections are 
+    read with two bulk queries and compared by exact name. Missing nodes are 
+    created, shading groups connected to the wrong shader are reconnected, 
+    duplicates left by name clashes are merged into the library node and 
+    nodes of retired materials are deleted. All changes run as one MEL 
+    batch.
+
+    Nodes whose shading groups still have members are never deleted or 
+    merged into another material, retired ones are kept and possible 
+    duplicates are flagged for review instead. Referenced nodes and Maya 
+    default nodes are never changed.
+
+    Args:
+        shader_dict: A dict mapping material names to a RGB color value
+        retired: Names of materials that were removed from the library
+        dry_run: Only plans the operations if True
+
+    Returns:
+        ShaderReconcileReport: The planned or applied operations
+    """
+    lamberts, sgs = index_shading_nodes()
+    shaders = index_surface_shaders(sgs)
+    names = set(shader_dict)
+    report = ShaderReconcileReport()
+    batch = []
+
+    # Library materials
+    for name, color in shader_dict.items():
+        sg_name = name + 'SG'
+        has_lambert = name in lamberts
+        has_sg = sg_name in sgs
+        connect = has_sg and shaders.get(sg_name) != name
+        if has_lambert and has_sg and not connect:
+            continue
+        if not has_lambert:
+            report.created.append(name)
+        if not has_sg:
+            report.created.append(sg_name)
+        if connect:
+            report.connected.append((name, sg_name))
+        batch.extend(shader_commands(name, None if has_lambert else color, 
+                                     has_lambert, has_sg, connect))
+
+    # Nodes outside the library, retired names are checked before the name 
+    # clash heuristic so a retired material is never merged into another
+    retired = set(retired) - names
+    retired_sgs = []
+    duplicate_sgs = []
+    for sg in sorted(sgs - {name + 'SG' for name in names} - 
+                     DEFAULT_SHADING_NODES):
+        if ':' in sg:
+            continue
+        if sg.endswith('SG') and sg[:-2] in retired:
+            retired_sgs.append(sg)
+            continue
+        name = duplicate_of(sg, names, 'SG', retired)
+        if name is not None:
+            duplicate_sgs.append((sg, name))
+    users = collections.defaultdict(list)
+    for sg, shader in shaders.items():
+        users[shader].append(sg)
+    retired_lamberts = []
+    duplicate_lamberts = []
+    for node in sorted(lamberts - names - DEFAULT_SHADING_NODES):
+        if ':' in node:
+            continue
+        if node in retired:
+            retired_lamberts.append(node)
+            continue
+        name = duplicate_of(node, names, known=retired)
+        if name is not None:
+            duplicate_lamberts.append((node, name))
+
+    # One members query for every shading group that could lose its shader
+    used = used_shading_groups(sorted(
+        set(retired_sgs) | {sg for sg, _ in duplicate_sgs} | 
+        {sg for node in retired_lamberts + 
+         [node for node, _ in duplicate_lamberts] for sg in users[node]}))
+
+    for sg, name in duplicate_sgs:
+        if sg in used:
+            report.flagged.append((sg, name + 'SG'))
+        else:
+            report.merged.append((sg, name + 'SG'))
+    merged_sgs = {sg for sg, _ in report.merged}
+
+    # Shading groups that are kept and use a duplicate lambert are moved to 
+    # the library lambert, unless they have members
+    for node, name in duplicate_lamberts:
+        kept = [sg for sg in users[node] 
+                if sg != name + 'SG' and sg not in merged_sgs]
+        if any(sg in used for sg in kept):
+            report.flagged.append((node, name))
+            continue
+        report.merged.append((node, name))
+        for sg in kept:
+            batch.append('connectAttr -f ' 
+                         f'{mel_string(name + ".outColor")} '
+                         f'{mel_string(sg + ".surfaceShader")};')
+
+    # Retired nodes that still hold objects are kept
+    for sg in retired_sgs:
+        if sg in used:
+            report.in_use.append(sg)
+        else:
+            report.deleted.append(sg)
+    for node in retired_lamberts:
+        if any(sg in used for sg in users[node]):
+            report.in_use.append(node)
+        else:
+            report.deleted.append(node)
+
+    doomed = [node for node, _ in report.merged] + report.deleted
+    if doomed:
+        batch.append('delete ' + ' '.join(mel_string(node) 
+                                          for node in doomed) + ';')
+    if batch and not dry_run:
+        with maya_batch('Reconcile Material ID Shaders'):
+            mel.eval('\n'.join(batch))
+        instrumentation.touch(len(report.created) + len(report.connected) + 
+                              len(doomed))
+    return report
+
+# Rule based assignment
+def short_name_regex(pattern):
+    """Translates an fnmatch pattern into a regex for the last DAG path segment
+
+    Unlike fnmatch.translate, wildcards and negated sets never match '|', so 
+    the pattern cannot reach into parent names.
+
+    Args:
+        pattern: An fnmatch pattern without '|'
+
+    Returns:
+        string: A regular expression that matches the whole segment
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '*':
+            parts.append('[^|]*')
+        elif char == '?':
+            parts.append('[^|]')
+        elif char == '[':
+            end = i + 1
+            if pattern[end:end + 1] == '!':
+                end += 1
+            if pattern[end:end + 1] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end < 0:
+                parts.append('\\[')
+            else:
+                content = pattern[i + 1:end].replace('\\', '\\\\')
+                if content.startswith('!'):
+                    parts.append('[^|' + content[1:] + ']')
+                elif content.startswith('^'):
+                    parts.append('[\\' + content + ']')
+                else:
+                    parts.append('[' + content + ']')
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ''.join(parts) + '\\Z'
+
+class AssignmentRules(object):
+    """Ordered object path pattern to material ID rules compiled into one matcher
+
+    Patterns are fnmatch patterns, or regular expressions when prefixed with 
+    're:'. Patterns containing '|' are matched against the full DAG path of a
+    transform, other patterns against its short name. The first rule that 
+    matches decides the material.
+    """
+    def __init__(self, rules):
+        """Initializes and compiles rules
+
+        Args:
+            rules: A list of (pattern, material name) tuples in priority order
+        """
+        self.rules = list(rules)
+        self.materials = [mat for _, mat in self.rules]
+        parts = []
+        for i, (pattern, _) in enumerate(self.rules):
+            if pattern.startswith('re:'):
+                regex = f'(?:{pattern[3:]})\\Z'
+            else:
+                if '|' in pattern:
+                    regex = fnmatch.translate(pattern)
+                else:
+                    regex = r'(?:.*\|)?' + short_name_regex(pattern)
+            parts.append(f'(?P<r{i}>{regex})')
+        # Alternatives are tried left to right, so rule order is kept
+        self.matcher = re.compile('|'.join(parts)) if parts else None
+
+    @classmethod
+    def from_file(cls, rules_path):
+        """Reads rules from a text file with one 'pattern = material' rule per line
+
+        Blank lines and lines starting with '#' are ignored.
+
+        Args:
+            rules_path: The path of the rules text file
+
+        Returns:
+            AssignmentRules: The compiled rules
+
+        Raises:
+            ValueError: An error occurs if a line is not a valid rule
+        """
+        rules = []
+        with open(rules_path, 'r') as rules_file:
+            for line_no, line in enumerate(rules_file, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                pattern, sep, mat = line.rpartition('=')
+                if not sep or not pattern.strip() or not mat.strip():
+                    raise ValueError(f'{rules_path} line {line_no}: expected '
+                                     f"'pattern = material', got {line!r}")
+                rules.append((pattern.strip(), mat.strip()))
+        return cls(rules)
+
+    def match(self, path):
+        """Gets the material of the first rule matching a DAG path
+
+        Args:
+            path: The full DAG path of a transform
+
+        Returns:
+            string: The material name or None if no rule matches
+        """
+        if self.matcher is None:
+            return None
+        match = self.matcher.match(path)
+        if match is None:
+            return None
+        return self.materials[int(match.lastgroup[1:])]
+
+def resolve_assignments(rules, shapes=None):
+    """Resolves the material of every mesh in one pass over the scene
+
+    Args:
+        rules: The AssignmentRules to apply
+        shapes: Optional list of long mesh shape names, defaults to every mesh
+
+    Returns:
+        A dict mapping material names to the list of mesh shapes they get
+    """
+    if shapes is None:
+        shapes = cmds.ls(type='mesh', long=True, noIntermediate=True) or []
+    members = collections.defaultdict(list)
+    for shape in shapes:
+        mat = rules.match(shape.rpartition('|')[0])
+        if mat is not None:
+            members[mat].append(shape)
+    return members
+
+def assign_materials(members):
+    """Assigns materials with one sets -forceElement call per shading group
+
+    Args:
+        members: A dict mapping material names to the objects or components 
+            they get
+
+    Returns:
+        tuple[dict, list[str]]: A dict mapping assigned material names to 
+        their member count and the material names skipped because their 
+        shading group does not exist
+    """
+    _, sgs = index_shading_nodes()
+    assigned = {}
+    missing = []
+    with maya_batch('Assign Material IDs'):
+        for mat, mat_members in members.items():
+            if mat + 'SG' not in sgs:
+                missing.append(mat)
+            elif mat_members:
+                cmds.sets(mat_members, e=True, forceElement=mat + 'SG')
+                assigned[mat] = len(mat_members)
+                instrumentation.touch(len(mat_members))
+    return assigned, missing
+
+def assign_by_rules(rules, shapes=None):
+    """Assigns materials to meshes based on ordered path rules
+
+    Args:
+        rules: The AssignmentRules to apply
+        shapes: Optional list of long mesh shape names, defaults to every mesh
+
+    Returns:
+        tuple[dict, list[str]]: A dict mapping assigned material names to 
+        their member count and the material names skipped because their 
+        shading group does not exist
+    """
+    return assign_materials(resolve_assignments(rules, shapes))
+
+# Face assignment
+def face_ranges(faces):
+    """Compresses face indices into contiguous ranges
+
+    This is the vectorised counterpart of index_runs for meshes with 
+    millions of faces.
+
+    Args:
+        faces: An array of face indices in any order, duplicates allowed
+
+    Returns:
+        np.ndarray: An (N, 2) array of the first and last face of each range
+    """
+    faces = np.unique(np.asarray(faces, dtype=np.int64))
+    if not len(faces):
+        return np.empty((0, 2), dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(faces) != 1) + 1
+    starts = faces[np.r_[0, breaks]]
+    ends = faces[np.r_[breaks - 1, len(faces) - 1]]
+    return np.stack([starts, ends], axis=1)
+
+def face_components(shape, faces):
+    """Gets the component strings of face indices, one per contiguous range
+
+    Args:
+        shape: The mesh shape name
+        faces: An array of face indices
+
+    Returns:
+        list[str]: Components such as 'pCubeShape1.f[0:11]'
+    """
+    return [f'{shape}.f[{first}:{last}]' if last > first 
+            else f'{shape}.f[{first}]' 
+            for first, last in face_ranges(faces).tolist()]
+
+def mesh_function_set(shape):
+    """Gets an API function set for a mesh
+
+    Args:
+        shape: The mesh shape or transform name
+
+    Returns:
+        om.MFnMesh: The function set of the mesh
+    """
+    selection = om.MSelectionList()
+    selection.add(shape)
+    return om.MFnMesh(selection.getDagPath(0))
+
+def face_shells(counts, vertices):
+    """Labels every face of a mesh with the connected shell it belongs to
+
+    Vertex labels start as their own index and repeatedly take the smallest
+    label of any face they are part of. The labels they held are lowered the 
+    same way and then followed, so shells converge in a few passes whatever 
+    the vertex order. All steps are whole-array NumPy operations.
+
+    Args:
+        counts: The number of vertices of every face
+        vertices: The vertex indices of all faces, face after face
+
+    Returns:
+        np.ndarray: One label per face, equal for faces of the same shell
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    vertices = np.asarray(vertices, dtype=np.int64)
+    if not len(counts):
+        return np.empty(0, dtype=np.int64)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    labels = np.arange(vertices.max() + 1)
+    while True:
+        corner_labels = labels[vertices]
+        face_labels = np.minimum.reduceat(corner_labels, offsets)
+        lowest = np.repeat(face_labels, counts)
+        updated = labels.copy()
+        np.minimum.at(updated, vertices, lowest)
+        np.minimum.at(updated, corner_labels, lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return face_labels
+        labels = updated
+
+def expand_to_shells(shape, faces):
+    """Grows face indices to the whole connected shells they touch
+
+    Args:
+        shape: The mesh shape name
+        faces: An array of face indices
+
+    Returns:
+        np.ndarray: The sorted face indices of every touched shell
+    """
+    counts, vertices = mesh_function_set(shape).getVertices()
+    shells = face_shells(counts, vertices)
+    faces = np.asarray(faces, dtype=np.int64)
+    return np.flatnonzero(np.isin(shells, shells[faces]))
+
+def read_face_selection():
+    """Reads the active selection as face index arrays per mesh
+
+    Returns:
+        tuple[list[str], dict[str, np.ndarray]]: Selected objects and 
+        non-face components as names, and long mesh shape names mapped to 
+        their selected face indices
+    """
+    selection = om.MGlobal.getActiveSelectionList()
+    objects = []
+    faces = collections.defaultdict(list)
+    for i in range(selection.length()):
+        try:
+            dag_path, component = selection.getComponent(i)
+        except TypeError:
+            # Dependency nodes such as shaders have no DAG path
+            objects.extend(selection.getSelectionStrings(i))
+            continue
+        if component.isNull():
+            objects.append(dag_path.fullPathName())
+        elif component.apiType() == om.MFn.kMeshPolygonComponent:
+            indices = om.MFnSingleIndexedComponent(component).getElements()
+            faces[dag_path.extendToShape().fullPathName()].append(
+                np.array(indices, dtype=np.int64))
+        else:
+            objects.extend(selection.getSelectionStrings(i))
+    return objects, {shape: np.concatenate(arrays) 
+                     for shape, arrays in faces.items()}
+
+def assign_faces(assignments, flood=False):
+    """Assigns face index arrays to shading groups with one call per shading group
+
+    Faces are compressed into ranges before they become component strings. 
+    When the faces cover a whole mesh, the mesh itself is assigned instead, 
+    which merges its per-face groups back into one object assignment.
+
+    Args:
+        assignments: A dict mapping shading group names to dicts that map 
+            mesh shape names to face index arrays, or to None to assign the 
+            whole object
+        flood: Grows the faces to the connected shells they touch if True
+
+    Returns:
+        dict[str, int]: The number of assigned members per shading group
+    """
+    assigned = {}
+    with maya_batch('Assign Material ID'):
+        for sg, shapes in assignments.items():
+            members = []
+            for shape, faces in shapes.items():
+                if faces is None:
+                    members.append(shape)
+                    continue
+                if flood:
+                    faces = expand_to_shells(shape, faces)
+                face_count = mesh_function_set(shape).numPolygons
+                if len(np.unique(faces)) == face_count:
+                    members.append(shape)
+                else:
+                    members.extend(face_components(shape, faces))
+            if members:
+                cmds.sets(members, e=True, forceElement=sg)
+                assigned[sg] = len(members)
+                instrumentation.touch(len(shapes))
+    return assigned
+
+# Material ID baking
+BAKE_COLOR_SET = 'materialId'
+
+def value_runs(values):
+    """Run-length encodes an array into runs of equal values
+
+    Args:
+        values: A one dimensional integer array
+
+    Returns:
+        np.ndarray: An (N, 3) array of the first index, last index and value 
+        of each run
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if not len(values):
+        return np.empty((0, 3), dtype=np.int64)
+    starts = np.r_[0, np.flatnonzero(np.diff(values)) + 1]
+    ends = np.r_[starts[1:] - 1, len(values) - 1]
+    return np.stack([starts, ends, values[starts]], axis=1)
+
+def mesh_face_shaders(shape):
+    """Gets the shading group of every face of a mesh with one API call
+
+    Args:
+        shape: The mesh shape name
+
+    Returns:
+        tuple[om.MFnMesh, list[str], np.ndarray]: The function set of the 
+        mesh, its shading group names and the index into them of every 
+        face, -1 for faces without a shading group
+    """
+    mesh_fn = mesh_function_set(shape)
+    shaders, indices = mesh_fn.getConnectedShaders(
+        mesh_fn.dagPath().instanceNumber())
+    sgs = [om.MFnDependencyNode(sg).name() for sg in shaders]
+    return mesh_fn, sgs, np.array(indices, dtype=np.int32)
+
+def mesh_face_ids(shape, sg_ids):
+    """Gets the material ID of every face of a mesh with one API call
+
+    Args:
+        shape: The mesh shape name
+        sg_ids: A dict mapping shading group names to ID indices
+
+    Returns:
+        tuple[om.MFnMesh, np.ndarray]: The function set of the mesh and the 
+        ID index of every face, -1 for faces without a material ID
+    """
+    mesh_fn, sgs, indices = mesh_face_shaders(shape)
+    lookup = np.array([sg_ids.get(sg, -1) for sg in sgs] + [-1], 
+                      dtype=np.int32)
+    # Faces without a shader have index -1, the last lookup entry
+    return mesh_fn, lookup[indices]
+
+def bake_id_colors(names, colors, shapes=None, color_set=BAKE_COLOR_SET, 
+                   per_vertex=False):
+    """Writes the color of every face's material ID into a color set
+
+    The color set holds only the palette, one entry per ID plus black for 
+    faces without an ID, and every face vertex gets a palette index with 
+    one assignColors call per mesh. Per-vertex colors give each vertex the 
+    ID of one of its faces, so the colors blend across ID borders.
+
+    Args:
+        names: The material names in ID order
+        colors: A dict mapping material names to a RGB color value
+        shapes: Optional list of long mesh shape names, defaults to every mesh
+        color_set: The name of the color set to create or overwrite
+        per_vertex: Bakes one color per vertex instead of per face if True
+
+    Returns:
+        int: The number of baked faces
+    """
+    if shapes is None:
+        shapes = cmds.ls(type='mesh', long=True, noIntermediate=True) or []
+    sg_ids = {name + 'SG': i for i, name in enumerate(names)}
+    palette = om.MColorArray([om.MColor(colors[name]) for name in names] + 
+                             [om.MColor((0.0, 0.0, 0.0))])
+    baked = 0
+    with instrumentation.phase('bake'):
+        for shape in shapes:
+            mesh_fn, face_ids = mesh_face_ids(shape, sg_ids)
+            face_ids[face_ids < 0] = len(names)
+            counts, vertices = mesh_fn.getVertices()
+            counts = np.array(counts, dtype=np.int64)
+            vertices = np.array(vertices, dtype=np.int64)
+            color_ids = np.repeat(face_ids, counts)
+            if per_vertex:
+                vertex_ids = np.full(mesh_fn.numVertices, len(names))
+                vertex_ids[vertices] = color_ids
+                color_ids = vertex_ids[vertices]
+
+            if color_set not in mesh_fn.getColorSetNames():
+                mesh_fn.createColorSet(color_set, True)
+            mesh_fn.setCurrentColorSetName(color_set)
+            mesh_fn.setColors(palette, color_set)
+            mesh_fn.assignColors(om.MIntArray(color_ids.tolist()), color_set)
+            baked += len(face_ids)
+        instrumentation.touch(len(shapes))
+    return baked
+
+def export_id_table(path, names, shapes=None):
+    """Streams the material ID of every face range to a CSV or JSON lines file
+
+    Faces are written as runs of equal IDs, one mesh at a time, so memory 
+    stays bounded by the largest mesh. CSV files get one row per run with 
+    the material name. Other files get a header line with the material 
+    names followed by one JSON object per mesh whose runs hold the first 
+    face, last face and ID index, -1 for faces without an ID.
+
+    Args:
+        path: The output path, ending in .csv for CSV
+        names: The material names in ID order
+        shapes: Optional list of long mesh shape names, defaults to every mesh
+
+    Returns:
+        int: The number of written meshes
+    """
+    if shapes is None:
+        shapes = cmds.ls(type='mesh', long=True, noIntermediate=True) or []
+    sg_ids = {name + 'SG': i for i, name in enumerate(names)}
+    as_csv = path.lower().endswith('.csv')
+    with open(path, 'w', newline='') as table_file:
+        if as_csv:
+            writer = csv.writer(table_file)
+            writer.writerow(['shape', 'first_face', 'last_face', 'material'])
+        else:
+            table_file.write(json.dumps({'materials': list(names)}) + '\n')
+        for shape in shapes:
+            _, face_ids = mesh_face_ids(shape, sg_ids)
+            runs = value_runs(face_ids).tolist()
+            if as_csv:
+                writer.writerows([shape, first, last, 
+                                  names[mat] if mat >= 0 else ''] 
+                                 for first, last, mat in runs)
+            else:
+                table_file.write(json.dumps({'shape': shape, 
+                                             'faces': len(face_ids), 
+                                             'runs': runs}) + '\n')
+    return len(shapes)
+
+# Usage reports
+def material_usage(names, shapes=None):
+    """Counts the meshes and faces each material ID covers in the open scene
+
+    Every mesh is read with one shading group query, and the faces are 
+    counted per ID with NumPy.
+
+    Args:
+        names: The material names in ID order
+        shapes: Optional list of long mesh shape names, defaults to every mesh
+
+    Returns:
+        dict[str, list[int]]: The used material names mapped to their mesh 
+        count and face count
+    """
+    if shapes is None:
+        shapes = cmds.ls(type='mesh', long=True, noIntermediate=True) or []
+    sg_ids = {name + 'SG': i for i, name in enumerate(names)}
+    meshes = np.zeros(len(names), dtype=np.int64)
+    faces = np.zeros(len(names), dtype=np.int64)
+    for shape in shapes:
+        _, face_ids = mesh_face_ids(shape, sg_ids)
+        counts = np.bincount(face_ids[face_ids >= 0], minlength=len(names))
+        faces += counts
+        meshes += counts > 0
+    return {names[i]: [int(meshes[i]), int(faces[i])] 
+            for i in np.flatnonzero(meshes).tolist()}
+
+def read_unused_materials(path):
+    """Reads the materials that no scene used from a usage report
+
+    Args:
+        path: A usage totals report written by materialIdBatch.py, CSV if 
+            it ends in .csv and JSON lines otherwise
+
+    Returns:
+        list[str]: The material names with a scene count of zero
+
+    Raises:
+        ValueError: An error occurs if scenes failed in the run that wrote 
+            the report, so its unused materials may be in use
+    """
+    with open(path, 'r', newline='') as report_file:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(report_file))
+        else:
+            rows = [json.loads(line) for line in report_file if line.strip()]
+    failed = max((int(row.get('failed_scenes') or 0) for row in rows), 
+                 default=0)
+    if failed:
+        raise ValueError(f'{path} is incomplete, {failed} scenes failed in '
+                         'the usage run')
+    return [row['material'] for row in rows if int(row['scenes']) == 0]
+
+# Assignment snapshots
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE_INFO_PREFIX = 'materialIdSnapshot_'
+
+def capture_assignments(shapes=None):
+    """Captures the shading group of every face of every mesh
+
+    Shading group names are stored once and meshes refer to them by index.
+    A mesh with one shading group is stored as that index, other meshes as 
+    run starts and the shading group index of each run, -1 for faces 
+    without one.
+
+    Args:
+        shapes: Optional list of long mesh shape names, defaults to every mesh
+
+    Returns:
+        dict: The snapshot, ready to be saved as JSON
+    """
+    if shapes is None:
+        shapes = cmds.ls(type='mesh', long=True, noIntermediate=True) or []
+    sg_index = {}
+    meshes = []
+    with instrumentation.phase('capture'):
+        for shape in shapes:
+            _, sgs, indices = mesh_face_shaders(shape)
+            lookup = np.array([sg_index.setdefault(sg, len(sg_index)) 
+                               for sg in sgs] + [-1], dtype=np.int32)
+            runs = value_runs(lookup[indices])
+            if len(runs) == 1:
+                meshes.append({'shape': shape, 'sg': int(runs[0, 2])})
+            else:
+                meshes.append({'shape': shape, 'faces': len(indices),
+                               'starts': runs[:, 0].tolist(), 
+                               'sgs': runs[:, 2].tolist()})
+    return {'version': SNAPSHOT_VERSION, 'sgs': list(sg_index), 
+            'meshes': meshes}
+
+def restore_assignments(snapshot):
+    """Restores a snapshot with one sets -forceElement call per shading group
+
+    Meshes and shading groups that no longer exist are skipped.
+
+    Args:
+        snapshot: A snapshot from capture_assignments
+
+    Returns:
+        tuple[int, list[str]]: The number of restored meshes and the names 
+        of shading groups that no longer exist
+    """
+    sgs = snapshot['sgs']
+    meshes = snapshot['meshes']
+    existing = set(cmds.ls([mesh['shape'] for mesh in meshes], long=True) 
+                   or [])
+    _, scene_sgs = index_shading_nodes()
+    members = collections.defaultdict(list)
+    restored = 0
+    for mesh in meshes:
+        shape = mesh['shape']
+        if shape not in existing:
+            continue
+        restored += 1
+        if 'sg' in mesh:
+            if mesh['sg'] >= 0:
+                members[sgs[mesh['sg']]].append(shape)
+            continue
+        ends = mesh['starts'][1:] + [mesh['faces']]
+        for first, end, sg in zip(mesh['starts'], ends, mesh['sgs']):
+            if sg >= 0:
+                members[sgs[sg]].append(f'{shape}.f[{first}:{end - 1}]')
+
+    missing = sorted(sg for sg in members if sg not in scene_sgs)
+    with maya_batch('Restore Material Assignments'):
+        for sg, sg_members in members.items():
+            if sg in scene_sgs:
+                cmds.sets(sg_members, e=True, forceElement=sg)
+                instrumentation.touch(len(sg_members))
+    return restored, missing
+
+def encode_snapshot(snapshot):
+    """Packs a snapshot into a compressed ASCII string for scene file info
+
+    Args:
+        snapshot: A snapshot from capture_assignments
+
+    Returns:
+        string: Base64 encoded zlib compressed JSON
+    """
+    data = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+    return base64.b64encode(zlib.compress(data)).decode('ascii')
+
+def decode_snapshot(text):
+    """Unpacks a snapshot packed by encode_snapshot
+
+    Args:
+        text: The packed snapshot
+
+    Returns:
+        dict: The snapshot
+    """
+    return json.loads(zlib.decompress(base64.b64decode(text)))
+
+def save_snapshot(name, snapshot, path=None):
+    """Stores a snapshot in the scene file info or in a sidecar file
+
+    Args:
+        name: The snapshot name
+        snapshot: A snapshot from capture_assignments
+        path: Optional sidecar JSON file path, defaults to the scene
+    """
+    if path is None:
+        cmds.fileInfo(SNAPSHOT_FILE_INFO_PREFIX + name, 
+                      encode_snapshot(snapshot))
+        return
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+def load_snapshot(name=None, path=None):
+    """Reads a snapshot from the scene file info or from a sidecar file
+
+    Args:
+        name: The snapshot name in the scene
+        path: Optional sidecar JSON file path, used instead of the scene
+
+    Returns:
+        dict: The snapshot, or None if the scene has no snapshot of that name
+    """
+    if path is not None:
+        with open(path, 'r') as snapshot_file:
+            return json.load(snapshot_file)
+    values = cmds.fileInfo(SNAPSHOT_FILE_INFO_PREFIX + name, query=True)
+    return decode_snapshot(values[0]) if values else None
+
+def snapshot_names():
+    """Lists the snapshots stored in the scene
+
+    Returns:
+        list[str]: The snapshot names
+    """
+    info = cmds.fileInfo(query=True) or []
+    prefix = SNAPSHOT_FILE_INFO_PREFIX
+    return [key[len(prefix):] for key in info[::2] if key.startswith(prefix)]
+
+# Material member index
+MEMBER_PLUG_PATTERN = re.compile(
+    r'^([^.]+)\.instObjGroups\[(\d+)\](?:\.objectGroups\[(\d+)\])?$')
+
+class MaterialMemberIndex(object):
+    """Reverse index from shading groups to the shapes and face sets assigned to them
+
+    The index is built with one connection query over every shading group 
+    and kept current by a DG connection callback that marks the shading 
+    groups whose members changed as dirty. Dirty groups are queried again 
+    on their own the next time they are needed. Bulk operations of the tool 
+    itself run paused, so they do not run the callback once per connection.
+    """
+    def __init__(self):
+        """Initializes an empty index"""
+        self.members = None
+        self.dirty = set()
+        self.callback_ids = []
+        self.listeners = []
+
+    def build(self):
+        """Indexes the members of every shading group with one bulk query"""
+        _, sgs = index_shading_nodes()
+        self.members = {sg: [] for sg in sgs}
+        self.dirty.clear()
+        self.query(sgs)
+
+    def query(self, sgs):
+        """Reads the members of the given shading groups into the index
+
+        Args:
+            sgs: A list of existing shading group names
+        """
+        for sg in sgs:
+            self.members[sg] = []
+        if not sgs:
+            return
+        plugs = cmds.listConnections([sg + '.dagSetMembers' for sg in sgs], 
+                                     source=True, destination=False, 
+                                     connections=True, plugs=True) or []
+        for sg_plug, member_plug in zip(plugs[::2], plugs[1::2]):
+            match = MEMBER_PLUG_PATTERN.match(member_plug)
+            if match:
+                shape, instance, group = match.groups()
+                self.members[sg_plug.partition('.')[0]].append(
+                    (shape, int(instance),
+                     None if group is None else int(group)))
+
+    def refresh(self):
+        """Builds the index on first use and queries dirty shading groups again"""
+        if self.members is None:
+            self.build()
+        elif self.dirty:
+            dirty = list(self.dirty)
+            self.dirty.clear()
+            for sg in dirty:
+                self.members.pop(sg, None)
+            self.query(cmds.ls(dirty, exactType='shadingEngine') or [])
+
+    def count(self, sg):
+        """Gets the number of shapes and face sets assigned to a shading group
+
+        Args:
+            sg: The shading group name
+
+        Returns:
+            int: The member count, zero for unknown shading groups
+        """
+        self.refresh()
+        return len(self.members.get(sg, ()))
+
+    def selection(self, sg):
+        """Gets the objects and faces assigned to a shading group
+
+        Face sets are resolved from their component list when asked for, so 
+        they are always current even if faces moved between groups.
+
+        Args:
+            sg: The shading group name
+
+        Returns:
+            list[str]: Shape names and face components that can be selected
+        """
+        self.refresh()
+        selection = []
+        for shape, instance, group in self.members.get(sg, ()):
+            path = self.instance_path(shape, instance)
+            if group is None:
+                selection.append(path)
+                continue
+            comps = cmds.getAttr(f'{shape}.instObjGroups[{instance}]'
+                                 f'.objectGroups[{group}].objectGrpCompList'
+                                 ) or []
+            selection.extend(f'{path}.{comp}' for comp in comps)
+        return selection
+
+    def instance_path(self, shape, instance):
+        """Gets the DAG path of one instance of a shape
+
+        Args:
+            shape: The shape name
+            instance: The instance number from the instObjGroups plug
+
+        Returns:
+            string: The shape name itself for the first instance, otherwise 
+            the full path below the parent of that instance
+        """
+        if not instance:
+            return shape
+        parents = cmds.listRelatives(shape, allParents=True, 
+                                     fullPath=True) or []
+        if instance >= len(parents):
+            return shape
+        return f'{parents[instance]}|{shape.rpartition("|")[2]}'
+
+    def invalidate(self, sgs=None):
+        """Marks shading groups as dirty, or the whole index if none are given
+
+        Args:
+            sgs: Optional list of shading group names
+        """
+        if sgs is None:
+            self.members = None
+        else:
+            self.dirty.update(sgs)
+        for listener in self.listeners:
+            listener()
+
+    def on_connection(self, src_plug, dst_plug, made, client_data):
+        """Marks the shading group of a changed set member connection as dirty"""
+        node = dst_plug.node()
+        if node.hasFn(om.MFn.kShadingEngine):
+            self.invalidate([om.MFnDependencyNode(node).name()])
+
+    def on_name_changed(self, node, old_name, client_data):
+        """Drops the index when a shape that may be a member is renamed"""
+        if node.hasFn(om.MFn.kMesh) and self.members is not None:
+            self.invalidate()
+
+    def start_tracking(self):
+        """Registers the callbacks that keep the index current"""
+        if self.callback_ids:
+            return
+        self.callback_ids = [
+            om.MDGMessage.addConnectionCallback(self.on_connection),
+            om.MNodeMessage.addNameChangedCallback(om.MObject.kNullObj, 
+                                                   self.on_name_changed),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, 
+                                         lambda *args: self.invalidate()),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, 
+                                         lambda *args: self.invalidate())]
+
+    def stop_tracking(self):
+        """Removes the callbacks of the index"""
+        if self.callback_ids:
+            om.MMessage.removeCallbacks(self.callback_ids)
+        self.callback_ids = []
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Removes the callbacks for a bulk operation and invalidates the index once after
+
+        Tracking is only started again if it was running before the block.
+        """
+        tracking = bool(self.callback_ids)
+        self.stop_tracking()
+        try:
+            yield
+        finally:
+            if tracking:
+                self.start_tracking()
+            self.invalidate()
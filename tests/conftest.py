@@ -0,0 +1,24 @@
+"""Puts the scripts and the fake Maya modules on the import path"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(ROOT, 'scripts')
+FAKE_MAYA_DIR = os.path.join(ROOT, 'benchmarks', 'fakemaya')
+sys.path[:0] = [SCRIPTS_DIR, FAKE_MAYA_DIR]
+
+import fakescene
+
+@pytest.fixture
+def scene():
+    """Gets the fake Maya scene, emptied before and after the test"""
+    fakescene.reset()
+    yield fakescene
+    fakescene.reset()
+
+@pytest.fixture(autouse=True)
+def library_cache(tmp_path, monkeypatch):
+    """Keeps compiled material library caches out of the home folder"""
+    monkeypatch.setenv('MATERIAL_ID_CACHE', str(tmp_path / 'cache'))
@@ -0,0 +1,7 @@
+"""Material ID runs for baking and table export"""
+from materialIdCore import value_runs
+
+def test_value_runs():
+    assert value_runs([3, 3, -1, -1, -1, 0, 3]).tolist() == [
+        [0, 1, 3], [2, 4, -1], [5, 5, 0], [6, 6, 3]]
+    assert value_runs([]).shape == (0, 3)
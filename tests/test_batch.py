@@ -0,0 +1,135 @@
+"""Runs the batch command line with the current interpreter as mayapy"""
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+from conftest import FAKE_MAYA_DIR
+import materialIdBatch
+from materialIdCore import read_unused_materials
+
+@pytest.fixture
+def batch_env(tmp_path, monkeypatch):
+    """Lets the workers import the fake Maya and writes a material library"""
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(
+        [FAKE_MAYA_DIR, os.environ.get('PYTHONPATH', '')]))
+    library = tmp_path / 'ids.txt'
+    library.write_text('Wood\nMetal\nGlass\n')
+    return tmp_path, str(library)
+
+def write_scene(path, **data):
+    """Writes a fake Maya scene file
+
+    Args:
+        path: The scene file path
+        **data: The nodes, members or crash keys of the fake scene
+    """
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_main_creates_shaders_and_saves(batch_env, capsys):
+    tmp_path, library = batch_env
+    scenes = [write_scene(tmp_path / f'shot{i}.ma', nodes={})
+              for i in range(3)]
+    report = tmp_path / 'report.json'
+    code = materialIdBatch.main(scenes + [
+        '--library', library, '--mayapy', sys.executable, '--workers', '2',
+        '--save', '--report', str(report)])
+
+    assert code == 0
+    results = json.loads(report.read_text())
+    assert [result['scene'] for result in results] == scenes
+    assert all(result['ok'] for result in results)
+    assert results[0]['stats']['created'] == 6
+    saved = json.loads((tmp_path / 'shot0.ma').read_text())
+    assert {'Wood', 'WoodSG', 'Glass', 'GlassSG'} <= set(saved['nodes'])
+    assert '3 scenes processed, 0 failed' in capsys.readouterr().out
+
+def test_main_reports_failing_scene(batch_env, capsys):
+    tmp_path, library = batch_env
+    good = write_scene(tmp_path / 'good.ma', nodes={})
+    missing = str(tmp_path / 'missing.ma')
+    code = materialIdBatch.main([good, missing, '--library', library,
+                                 '--mayapy', sys.executable,
+                                 '--workers', '1'])
+
+    assert code == 1
+    out = capsys.readouterr().out
+    assert f'RuntimeError: File not found: {missing}' in out
+    assert '1 scenes processed, 1 failed' in out
+
+def test_run_tasks_restarts_dead_worker(batch_env):
+    tmp_path, library = batch_env
+    scenes = [write_scene(tmp_path / 'before.ma', nodes={}),
+              write_scene(tmp_path / 'crash.ma', crash=3),
+              write_scene(tmp_path / 'after.ma', nodes={})]
+    tasks = [{'scene': scene, 'library': library} for scene in scenes]
+    results = materialIdBatch.run_tasks(tasks, 1, sys.executable)
+
+    assert [result['ok'] for result in results] == [True, False, True]
+    assert results[1]['error'] == 'worker exited with code 3'
+
+def test_parse_args_rejects_missing_mayapy(tmp_path):
+    with pytest.raises(SystemExit):
+        materialIdBatch.parse_args(['shot.ma', '--library', 'ids.txt',
+                                    '--mayapy', str(tmp_path / 'nope')])
+
+def test_main_writes_usage_reports(batch_env):
+    tmp_path, library = batch_env
+    scenes = [write_scene(tmp_path / f'shot{i}.ma', nodes={})
+              for i in range(2)]
+    usage = tmp_path / 'usage.csv'
+    code = materialIdBatch.main(scenes + [
+        '--library', library, '--mayapy', sys.executable,
+        '--usage', str(usage), '--usage-scenes',
+        str(tmp_path / 'scenes.jsonl')])
+
+    assert code == 0
+    with open(usage, newline='') as usage_file:
+        rows = list(csv.DictReader(usage_file))
+    assert [row['material'] for row in rows] == ['Wood', 'Metal', 'Glass']
+    assert all(row['scenes'] == '0' for row in rows)
+    assert read_unused_materials(str(usage)) == ['Wood', 'Metal', 'Glass']
+
+def test_usage_with_failed_scenes_cannot_be_pruned(batch_env):
+    tmp_path, library = batch_env
+    good = write_scene(tmp_path / 'good.ma', nodes={})
+    usage = str(tmp_path / 'usage.jsonl')
+    code = materialIdBatch.main([good, str(tmp_path / 'missing.ma'),
+                                 '--library', library, '--mayapy',
+                                 sys.executable, '--usage', usage])
+
+    assert code == 1
+    with pytest.raises(ValueError, match='1 scenes failed'):
+        read_unused_materials(usage)
+
+def test_usage_report_totals_and_scene_rows(tmp_path):
+    report = materialIdBatch.UsageReport(str(tmp_path / 'scenes.csv'))
+    report.add({'scene': 'a.ma', 'ok': True, 'stats': {
+        'names': ['Wood', 'Metal', 'Glass'],
+        'usage': {'Wood': [2, 10], 'Metal': [1, 4]}}})
+    second = {'scene': 'b.ma', 'ok': True,
+              'stats': {'usage': {'Wood': [1, 6]}}}
+    report.add(second)
+    report.add({'scene': 'c.ma', 'ok': False, 'error': 'boom'})
+    report.close()
+    report.write(str(tmp_path / 'usage.jsonl'))
+
+    assert second['stats'] == {'ids_used': 1}
+    assert report.unused() == ['Glass']
+    totals = [json.loads(line) for line in
+              (tmp_path / 'usage.jsonl').read_text().splitlines()]
+    assert totals[0] == {'material': 'Wood', 'scenes': 2, 'meshes': 3,
+                         'faces': 16, 'failed_scenes': 1}
+    assert totals[2]['scenes'] == 0
+    rows = (tmp_path / 'scenes.csv').read_text().splitlines()
+    assert rows == ['scene,material,meshes,faces', 'a.ma,Wood,2,10',
+                    'a.ma,Metal,1,4', 'b.ma,Wood,1,6']
+
+def test_read_unused_materials_accepts_reports_without_failures(tmp_path):
+    path = tmp_path / 'usage.csv'
+    path.write_text('material,scenes,meshes,faces\nWood,0,0,0\n'
+                    'Metal,3,5,40\n')
+    assert read_unused_materials(str(path)) == ['Wood']
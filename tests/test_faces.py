@@ -0,0 +1,44 @@
+"""Vectorised face index helpers"""
+import numpy as np
+
+from materialIdCore import (face_components, face_ranges, face_shells,
+                            index_runs)
+
+def test_face_ranges_sorts_and_merges_duplicates():
+    assert face_ranges([5, 1, 2, 3, 9, 2]).tolist() == [[1, 3], [5, 5],
+                                                         [9, 9]]
+    assert face_ranges([]).shape == (0, 2)
+    assert face_components('pCubeShape1', [4, 0, 1, 2]) == [
+        'pCubeShape1.f[0:2]', 'pCubeShape1.f[4]']
+
+def test_index_runs_matches_face_ranges():
+    indices = [0, 1, 2, 7, 8, 12]
+    assert [list(run) for run in index_runs(indices)] == \
+        face_ranges(indices).tolist()
+
+def test_face_shells_labels_connected_faces():
+    # Two quads sharing an edge, a separate triangle and a quad touching
+    # the triangle only at one corner
+    counts = [4, 4, 3, 4]
+    vertices = [0, 1, 2, 3, 1, 4, 5, 2, 6, 7, 8, 8, 9, 10, 11]
+    shells = face_shells(counts, vertices)
+    assert shells[0] == shells[1]
+    assert shells[2] == shells[3]
+    assert shells[0] != shells[2]
+    assert face_shells([], []).shape == (0,)
+
+def test_face_shells_with_scrambled_vertex_order():
+    rng = np.random.default_rng(3)
+    strips, length = 5, 200
+    # Every strip is a row of quads, vertex numbers are shuffled
+    order = rng.permutation(strips * (length + 1) * 2)
+    counts, vertices = [], []
+    for strip in range(strips):
+        base = strip * (length + 1) * 2
+        for i in range(length):
+            top, bottom = base + i, base + length + 1 + i
+            vertices += [top, top + 1, bottom + 1, bottom]
+            counts.append(4)
+    shells = face_shells(counts, order[vertices]).reshape(strips, length)
+    assert (shells == shells[:, :1]).all()
+    assert len(set(shells[:, 0].tolist())) == strips
@@ -0,0 +1,26 @@
+"""Material file validation and the compiled library cache"""
+from materialIdCore import load_material_library, parse_material_lines
+
+def test_parse_material_lines_reports_skipped_lines():
+    names, issues = parse_material_lines(
+        ['Wood\n', '\n', 'My Metal\n', 'Wood\n', '2Glass', 'Glass'])
+    assert names == ['Wood', 'Glass']
+    assert issues == [(2, '', 'blank line'),
+                      (3, 'My Metal', 'illegal Maya node name'),
+                      (4, 'Wood', 'duplicate name'),
+                      (5, '2Glass', 'illegal Maya node name')]
+
+def test_load_material_library_uses_cache_until_file_changes(tmp_path):
+    path = tmp_path / 'ids.txt'
+    path.write_text('Wood\nMetal\n')
+    first = load_material_library(str(path))
+    assert first.names == ['Wood', 'Metal']
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    assert load_material_library(str(path)).colors == first.colors
+
+    path.write_text('Wood\nMetal\nGlass extra\nGlass\n')
+    library = load_material_library(str(path))
+    assert library.names == ['Wood', 'Metal', 'Glass']
+    assert library.issues == [(3, 'Glass extra', 'illegal Maya node name')]
+    assert library.index['Glass'] == 2
+    assert library.colors['Wood'] == first.colors['Wood']
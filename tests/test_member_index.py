@@ -0,0 +1,35 @@
+"""Reverse index from shading groups to their members"""
+from materialIdCore import (MEMBER_PLUG_PATTERN, MaterialMemberIndex,
+                            build_shaders)
+
+def test_member_plug_pattern_keeps_instance_and_face_set():
+    match = MEMBER_PLUG_PATTERN.match(
+        'wheelShape.instObjGroups[2].objectGroups[5]')
+    assert match.groups() == ('wheelShape', '2', '5')
+    match = MEMBER_PLUG_PATTERN.match('bodyShape.instObjGroups[0]')
+    assert match.groups() == ('bodyShape', '0', None)
+
+def test_index_counts_and_selects_members(scene):
+    build_shaders({'Wood': (1, 0, 0), 'Metal': (0, 1, 0)})
+    scene.sets(['pCubeShape1', 'pSphereShape1'], forceElement='WoodSG')
+    index = MaterialMemberIndex()
+    assert index.count('WoodSG') == 2
+    assert index.count('MetalSG') == 0
+    assert index.selection('WoodSG') == ['pCubeShape1', 'pSphereShape1']
+
+def test_paused_skips_callbacks_and_invalidates_once(scene):
+    index = MaterialMemberIndex()
+    updates = []
+    index.listeners.append(lambda: updates.append(1))
+    index.start_tracking()
+    index.build()
+    with index.paused():
+        assert index.callback_ids == []
+    assert len(index.callback_ids) == 4
+    assert index.members is None
+    assert updates == [1]
+
+    index.stop_tracking()
+    with index.paused():
+        pass
+    assert index.callback_ids == []
@@ -0,0 +1,49 @@
+"""Stable, distinct palette colors shared through the colors file"""
+import json
+import os
+
+from materialIdCore import PaletteStore, generate_palette
+
+def test_palette_keeps_colors_and_reserves_deleted_ones(tmp_path):
+    mat_path = str(tmp_path / 'ids.txt')
+    colors = PaletteStore(mat_path).assign(['Wood', 'Metal'])
+    assert len(set(colors.values())) == 2
+
+    palette = PaletteStore(mat_path)
+    assert palette.colors == colors
+    more = palette.assign(['Metal', 'Glass'])
+    assert more['Metal'] == colors['Metal']
+    assert more['Glass'] not in colors.values()
+    saved = json.loads((tmp_path / 'ids.txt.colors.json').read_text())
+    assert set(saved) == {'Wood', 'Metal', 'Glass'}
+    assert not list(tmp_path.glob('*.tmp'))
+    assert not list(tmp_path.glob('*.lock'))
+
+def test_concurrent_sessions_keep_each_others_colors(tmp_path):
+    mat_path = str(tmp_path / 'ids.txt')
+    PaletteStore(mat_path).assign(['Wood', 'Metal'])
+    first = PaletteStore(mat_path)
+    second = PaletteStore(mat_path)
+    clay = first.assign(['Wood', 'Metal', 'Clay'])['Clay']
+    tile = second.assign(['Wood', 'Metal', 'Tile'])['Tile']
+
+    assert clay != tile
+    saved = PaletteStore(mat_path).colors
+    assert set(saved) == {'Wood', 'Metal', 'Clay', 'Tile'}
+    assert saved['Clay'] == clay
+
+def test_stale_lock_is_taken_over(tmp_path):
+    mat_path = str(tmp_path / 'ids.txt')
+    lock_path = mat_path + '.colors.json.lock'
+    open(lock_path, 'w').close()
+    os.utime(lock_path, (0, 0))
+    assert set(PaletteStore(mat_path).assign(['Wood'])) == {'Wood'}
+    assert not os.path.exists(lock_path)
+
+def test_generate_palette_avoids_existing_colors():
+    existing = [(1.0, 0.0, 0.0), (0.0, 0.0, 1.0)]
+    colors, min_distance = generate_palette(30, existing)
+    assert len(colors) == 30
+    assert min_distance > 0
+    assert len({tuple(color) for color in colors.round(4).tolist()} | 
+               set(existing)) == 32
@@ -0,0 +1,50 @@
+"""Reconciliation of scene shading nodes with the library"""
+import materialIdCore
+from materialIdCore import duplicate_of, reconcile_shaders
+
+def add_material(scene, name, members=()):
+    scene.create('lambert', name)
+    scene.create('shadingEngine', name + 'SG')
+    if members:
+        scene.sets(list(members), forceElement=name + 'SG')
+
+def test_duplicate_of_requires_exact_name_and_number():
+    names = {'Metal', 'Material1', 'Material11'}
+    assert duplicate_of('Metal2', names) == 'Metal'
+    assert duplicate_of('MetalSG1', names, 'SG') == 'Metal'
+    assert duplicate_of('Material12', names) is None
+    assert duplicate_of('Metal2', names, known={'Metal2'}) is None
+    assert duplicate_of('Metal2SG', names, 'SG', known={'Metal2'}) is None
+    assert duplicate_of('MetalPaint1', names) is None
+    assert duplicate_of('Metal', names) is None
+
+def test_reconcile_never_merges_retired_or_used_nodes(scene):
+    library = {f'Material{i}': (1, 0, 0) for i in range(1, 12)}
+    library['Metal'] = (0, 0, 1)
+    for name in library:
+        add_material(scene, name)
+    add_material(scene, 'Material12', ['pCube1'])
+    add_material(scene, 'Material13')
+    add_material(scene, 'Metal01', ['pSphere1'])
+    scene.create('lambert', 'Metal2')
+    scene.create('shadingEngine', 'MetalSG1')
+    before = dict(scene.nodes)
+
+    report = reconcile_shaders(library, ['Material12', 'Material13'],
+                               dry_run=True)
+    assert scene.nodes == before
+    assert sorted(report.merged) == [('Metal2', 'Metal'),
+                                     ('MetalSG1', 'MetalSG')]
+    assert report.deleted == ['Material13SG', 'Material13']
+    assert report.in_use == ['Material12SG', 'Material12']
+    assert report.flagged == [('Metal01', 'Metal')]
+    assert 'review Metal01, it looks like a duplicate of Metal but still ' \
+        'has members' in report.lines()
+
+def test_reconcile_creates_missing_library_nodes(scene, monkeypatch):
+    scripts = []
+    monkeypatch.setattr(materialIdCore.mel, 'eval', scripts.append)
+    scene.create('lambert', 'Wood')
+    report = reconcile_shaders({'Wood': (1, 0, 0), 'Glass': (0, 0, 1)})
+    assert report.created == ['WoodSG', 'Glass', 'GlassSG']
+    assert len(scripts) == 1
@@ -0,0 +1,44 @@
+"""Rule based material assignment"""
+import pytest
+
+from materialIdCore import AssignmentRules, assign_by_rules, build_shaders
+
+def test_short_name_patterns_do_not_match_parents():
+    rules = AssignmentRules([('*wheel*', 'Rubber'), ('front_*', 'Wheel')])
+    assert rules.match('|Car|grp|front_wheel') == 'Rubber'
+    assert rules.match('|Car|wheels_grp|front_hub') == 'Wheel'
+    assert rules.match('|Car|wheels_grp|body') is None
+
+def test_negated_sets_do_not_match_separators():
+    rules = AssignmentRules([('[!b]*', 'Metal')])
+    assert rules.match('|Car|door') == 'Metal'
+    assert rules.match('|Car|body') is None
+
+def test_path_and_regex_patterns_and_rule_order():
+    rules = AssignmentRules([('|Car|*', 'Paint'), ('re:.*\\|glass_\\d+',
+                                                    'Glass'),
+                             ('glass_*', 'Wood')])
+    assert rules.match('|Car|door|handle') == 'Paint'
+    assert rules.match('|House|glass_01') == 'Glass'
+    assert rules.match('|House|glass_a') == 'Wood'
+    assert AssignmentRules([]).match('|Car') is None
+
+def test_from_file_skips_comments_and_rejects_bad_lines(tmp_path):
+    path = tmp_path / 'rules.txt'
+    path.write_text('# wheels\n\n*wheel* = Rubber\n')
+    assert AssignmentRules.from_file(str(path)).rules == [
+        ('*wheel*', 'Rubber')]
+    path.write_text('*wheel* Rubber\n')
+    with pytest.raises(ValueError, match='line 1'):
+        AssignmentRules.from_file(str(path))
+
+def test_assign_by_rules_groups_meshes_per_material(scene):
+    build_shaders({'Rubber': (0, 0, 0), 'Paint': (1, 0, 0)})
+    rules = AssignmentRules([('*wheel*', 'Rubber'), ('*', 'Paint'),
+                             ('glass', 'Glass')])
+    shapes = ['|Car|wheel_fl|wheel_flShape', '|Car|wheel_fr|wheel_frShape',
+              '|Car|body|bodyShape']
+    assigned, missing = assign_by_rules(rules, shapes)
+    assert assigned == {'Rubber': 2, 'Paint': 1}
+    assert missing == []
+    assert scene.connections['RubberSG'] == shapes[:2]
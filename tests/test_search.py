@@ -0,0 +1,46 @@
+"""Trigram material search"""
+import random
+
+from materialIdCore import MaterialSearchIndex
+
+NAMES = ['Material1', 'Material12', 'Metal_Brushed', 'Wood_Oak', 'Glass',
+         'Rubber', 'metal_painted']
+
+def test_substring_search_ignores_case_and_keeps_order():
+    index = MaterialSearchIndex(NAMES)
+    assert index.search('METAL') == ['Metal_Brushed', 'metal_painted']
+    assert index.search('al1') == ['Material1', 'Material12']
+    assert index.search('l') == ['Material1', 'Material12', 'Metal_Brushed',
+                                 'Glass', 'metal_painted']
+    assert index.search('  ') == NAMES
+
+def test_fuzzy_search_is_only_a_fallback():
+    index = MaterialSearchIndex(NAMES)
+    assert index.search('matrial12')[0] == 'Material12'
+    assert index.search('matrial12', fuzzy=False) == []
+    assert index.search('Wood') == ['Wood_Oak']
+
+def test_sync_matches_a_fresh_index():
+    rng = random.Random(7)
+    names = [f'{rng.choice(["Mat", "Wood", "Metal"])}_{i}' for i in range(200)]
+    index = MaterialSearchIndex(names)
+    for _ in range(50):
+        removed = set(rng.sample(names, 5))
+        names = [name for name in names if name not in removed]
+        names += [f'New_{rng.randrange(10 ** 6)}' for _ in range(3)]
+        names = list(dict.fromkeys(names))
+        index.sync(names)
+        fresh = MaterialSearchIndex(names)
+        for text in ['', 'wo', 'mat_1', 'new', 'etal', 'wodo_1']:
+            assert index.search(text) == fresh.search(text)
+
+def test_sync_rebuilds_on_reorder():
+    index = MaterialSearchIndex(['Wood', 'Metal', 'Glass'])
+    index.sync(['Metal', 'Wood', 'Glass'])
+    assert index.search('') == ['Metal', 'Wood', 'Glass']
+    assert index.names == ['Metal', 'Wood', 'Glass']
+
+def test_repeated_trigram_queries_need_the_whole_text():
+    index = MaterialSearchIndex(['aaab', 'Wood', 'xaaaa'])
+    assert index.search('aaaa') == ['xaaaa']
+    assert index.search('aaaaa', fuzzy=False) == []
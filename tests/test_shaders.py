@@ -0,0 +1,14 @@
+"""Bulk shader creation against the fake scene"""
+from materialIdCore import build_shaders
+
+def test_build_shaders_reuses_existing_nodes(scene):
+    first = build_shaders({'Material1': (1, 0, 0), 'Material10': (0, 1, 0)})
+    assert (first.created, first.reused) == (4, 0)
+    again = build_shaders({'Material1': (1, 0, 0), 'Material2': (0, 0, 1)})
+    assert (again.created, again.reused) == (2, 2)
+    assert {'Material1SG', 'Material2SG', 'Material10SG'} <= set(scene.nodes)
+
+def test_build_report_adds_later_passes(scene):
+    report = build_shaders({'Wood': (1, 0, 0), 'Metal': (0, 1, 0)})
+    report.add(build_shaders({'Glass': (0, 0, 1)}))
+    assert str(report) == '6 nodes created, 0 nodes reused'
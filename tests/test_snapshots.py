@@ -0,0 +1,51 @@
+"""Assignment snapshots"""
+import numpy as np
+
+import materialIdCore
+from materialIdCore import (capture_assignments, decode_snapshot,
+                            encode_snapshot, load_snapshot,
+                            restore_assignments, save_snapshot)
+
+FACE_SHADERS = {
+    '|car|bodyShape': (['PaintSG'], [0, 0, 0, 0]),
+    '|car|wheelShape': (['RubberSG', 'PaintSG'], [0, 0, 1, -1, -1, 0]),
+}
+
+def fake_face_shaders(shape):
+    sgs, indices = FACE_SHADERS[shape]
+    return None, sgs, np.array(indices, dtype=np.int32)
+
+def test_capture_stores_single_shader_meshes_compactly(monkeypatch):
+    monkeypatch.setattr(materialIdCore, 'mesh_face_shaders',
+                        fake_face_shaders)
+    snapshot = capture_assignments(list(FACE_SHADERS))
+    assert snapshot['sgs'] == ['PaintSG', 'RubberSG']
+    assert snapshot['meshes'] == [
+        {'shape': '|car|bodyShape', 'sg': 0},
+        {'shape': '|car|wheelShape', 'faces': 6, 'starts': [0, 2, 3, 5],
+         'sgs': [1, 0, -1, 1]}]
+
+def test_encode_round_trip_and_sidecar_file(tmp_path):
+    snapshot = {'version': 1, 'sgs': ['PaintSG'],
+                'meshes': [{'shape': '|car|bodyShape', 'sg': 0}]}
+    text = encode_snapshot(snapshot)
+    assert text.isascii()
+    assert decode_snapshot(text) == snapshot
+    path = str(tmp_path / 'lookdev.json')
+    save_snapshot('lookdev', snapshot, path)
+    assert load_snapshot(path=path) == snapshot
+
+def test_restore_skips_missing_meshes_and_shading_groups(scene):
+    scene.create('mesh', '|car|bodyShape')
+    scene.create('mesh', '|car|wheelShape')
+    scene.create('shadingEngine', 'PaintSG')
+    snapshot = {'version': 1, 'sgs': ['PaintSG', 'RubberSG'], 'meshes': [
+        {'shape': '|car|bodyShape', 'sg': 0},
+        {'shape': '|car|wheelShape', 'faces': 6, 'starts': [0, 2, 3, 5],
+         'sgs': [1, 0, -1, 0]},
+        {'shape': '|car|doorShape', 'sg': 0}]}
+    restored, missing = restore_assignments(snapshot)
+    assert restored == 2
+    assert missing == ['RubberSG']
+    assert scene.connections['PaintSG'] == [
+        '|car|bodyShape', '|car|wheelShape.f[2:2]', '|car|wheelShape.f[5:5]']
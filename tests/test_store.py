@@ -0,0 +1,74 @@
+"""Transactional material store"""
+import os
+import stat
+
+import pytest
+
+from materialIdCore import MaterialStore, split_material_names
+
+def test_split_material_names():
+    assert split_material_names(' Wood, Metal\tWood  Glass ') == [
+        'Wood', 'Metal', 'Glass']
+
+def test_store_commit_keeps_skipped_lines(tmp_path):
+    path = tmp_path / 'ids.txt'
+    path.write_text('Wood\nMy Metal\n\nWood\nGlass')
+    store = MaterialStore(str(path), ['Wood', 'Glass'])
+    assert store.add_many(['Stone', 'Wood', 'Bad Name']) == ['Stone']
+    assert path.read_text() == 'Wood\nMy Metal\n\nWood\nGlass\nStone'
+    assert store.delete_many(['Wood', 'Missing']) == ['Wood']
+    assert path.read_text() == 'My Metal\n\nGlass\nStone'
+    assert store.names == ['Glass', 'Stone']
+
+def test_store_keeps_edits_of_other_sessions(tmp_path):
+    path = tmp_path / 'ids.txt'
+    path.write_text('Wood\nGlass')
+    store = MaterialStore(str(path), ['Wood', 'Glass'])
+    path.write_text('Wood\nGlass\nPlastic')
+    store.add_many(['Stone'])
+    assert path.read_text() == 'Wood\nGlass\nPlastic\nStone'
+    assert 'Plastic' in store
+
+def test_store_transaction_writes_once_and_rolls_back(tmp_path):
+    path = tmp_path / 'ids.txt'
+    path.write_text('Wood')
+    store = MaterialStore(str(path), ['Wood'])
+    with store.transaction():
+        store.add_many(['Stone'])
+        store.add_many(['Glass'])
+        assert path.read_text() == 'Wood'
+    assert path.read_text() == 'Wood\nStone\nGlass'
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.delete_many(['Wood'])
+            raise RuntimeError('cancelled')
+    assert store.names == ['Wood', 'Stone', 'Glass']
+    assert path.read_text() == 'Wood\nStone\nGlass'
+
+def test_failed_commit_rolls_back(tmp_path, monkeypatch):
+    path = tmp_path / 'ids.txt'
+    path.write_text('Wood')
+    store = MaterialStore(str(path), ['Wood'])
+
+    def replace(source, target):
+        raise PermissionError('share is read only')
+    monkeypatch.setattr(os, 'replace', replace)
+    with pytest.raises(PermissionError):
+        store.add_many(['Stone'])
+    assert store.names == ['Wood']
+    assert 'Stone' not in store
+    assert store.ops == []
+    assert os.listdir(tmp_path) == ['ids.txt']
+
+    monkeypatch.undo()
+    assert store.add_many(['Stone']) == ['Stone']
+    assert path.read_text() == 'Wood\nStone'
+
+def test_commit_keeps_file_mode(tmp_path):
+    path = tmp_path / 'ids.txt'
+    path.write_text('Wood')
+    os.chmod(path, 0o640)
+    store = MaterialStore(str(path), ['Wood'])
+    store.add_many(['Stone'])
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640